@@ -1,36 +1,153 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, send_file
+import json
 import os
 import sys
-import fitz
 from werkzeug.utils import secure_filename
-import difflib
 import tempfile
 
 # Import the compare_pdfs function from pdf_compare.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from pdf_compare import compare_pdfs, is_italic_font
+from pdf_compare import COMPARE_MODES, compare_pdfs, is_italic_font
+from jobs import JobQueue, JobStore, QueueFullError, DONE
+from result_cache import ResultCache
+from upload_store import InvalidUploadError, UploadStore
+from page_renderer import IMAGE_FORMATS, ZOOM_LEVELS, PageRenderer
+from text_diff import (get_diff_backend, highlight_aligned_text_diff, highlight_text_diff, iter_diff_hunks,
+                       render_comparison_html)
 
 app = Flask(__name__)
 app.secret_key = 'pdf_comparison_secret_key'
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Uploads are streamed to disk, so the request limit only bounds disk use
+app.config['MAX_CONTENT_LENGTH'] = 256 * 1024 * 1024
+app.config['UPLOAD_MAX_AGE'] = 24 * 3600  # seconds an upload is kept
+app.config['UPLOAD_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # total size of uploads/
+app.config['UPLOAD_JANITOR_INTERVAL'] = 600  # seconds between upload cleanups
 
-# Create folders if they don't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+app.config['JOB_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs')
+app.config['RESULT_CACHE_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.compare_cache')
+app.config['RESULT_CACHE_MAX_BYTES'] = 512 * 1024 * 1024
+app.config['JOB_WORKERS'] = 2  # comparisons running at once
+app.config['JOB_MAX_QUEUED'] = 20  # comparisons waiting for a worker
+app.config['COMPARE_WORKERS'] = 1  # processes used for the pages of one comparison
+app.config['JOB_MAX_AGE'] = 24 * 3600  # seconds a finished job and its result are kept
+app.config['JOB_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # total size of jobs/
+app.config['JOB_JANITOR_INTERVAL'] = 600  # seconds between job cleanups
+app.config['PAGE_IMAGE_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.page_images')
+app.config['PAGE_IMAGE_MAX_BYTES'] = 512 * 1024 * 1024  # rendered pages kept on disk
+app.config['PAGE_IMAGE_MEMORY_BYTES'] = 64 * 1024 * 1024  # rendered pages kept in memory
+# Word diff used for pasted texts: 'difflib', 'myers', or 'cydifflib' if installed
+app.config['TEXT_DIFF_BACKEND'] = 'difflib'
+
+# Fail at startup rather than on the first comparison if the backend is missing
+get_diff_backend(app.config['TEXT_DIFF_BACKEND'])
+
+# Uploaded PDFs, stored once per content hash and expired in the background
+upload_store = UploadStore(
+    app.config['UPLOAD_FOLDER'],
+    max_age=app.config['UPLOAD_MAX_AGE'],
+    max_bytes=app.config['UPLOAD_MAX_BYTES']
+)
+
+# Page images for the result viewer, rendered on demand and shared by all viewers
+page_renderer = PageRenderer(
+    app.config['PAGE_IMAGE_FOLDER'],
+    max_bytes=app.config['PAGE_IMAGE_MAX_BYTES'],
+    memory_bytes=app.config['PAGE_IMAGE_MEMORY_BYTES']
+)
+
+# PDF comparisons run in the background so requests return immediately
+job_store = JobStore(
+    app.config['JOB_FOLDER'],
+    max_age=app.config['JOB_MAX_AGE'],
+    max_bytes=app.config['JOB_MAX_BYTES']
+)
+job_queue = JobQueue(
+    job_store,
+    max_workers=app.config['JOB_WORKERS'],
+    max_queued=app.config['JOB_MAX_QUEUED'],
+    compare_workers=app.config['COMPARE_WORKERS'],
+    cache=ResultCache(app.config['RESULT_CACHE_FOLDER'], max_bytes=app.config['RESULT_CACHE_MAX_BYTES'])
+)
+
+def start_background_work():
+    """Requeue interrupted jobs and start the upload and job janitors."""
+    upload_store.start_janitor(app.config['UPLOAD_JANITOR_INTERVAL'])
+    job_store.start_janitor(app.config['JOB_JANITOR_INTERVAL'])
+    job_queue.start()
+
+# Only the process serving requests may run jobs. `python app.py` uses the
+# Werkzeug reloader, which runs this file in a watching parent process as
+# well as in the serving child (where WERKZEUG_RUN_MAIN is set).
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_background_work()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'pdf'
 
-def get_pdf_page_count(pdf_path):
+def get_pdf_page_count(upload_id):
+    """Page count of a stored upload (read once per file, then cached)."""
     try:
-        doc = fitz.open(pdf_path)
-        count = len(doc)
-        doc.close()
-        return count
-    except Exception as e:
+        return upload_store.info(upload_id)['page_count']
+    except (KeyError, InvalidUploadError) as e:
         print(f"Error getting page count: {e}")
         return 0
 
+def stored_upload(name):
+    """Return the PDF sent as file `name`, or the stored upload `name`_id."""
+    file = request.files.get(name)
+    if file and file.filename:
+        if not allowed_file(file.filename):
+            raise InvalidUploadError(f'{name} must be a PDF file')
+        return upload_store.save(file)
+    upload = upload_store.get(request.form.get(f'{name}_id'))
+    if upload is None:
+        raise InvalidUploadError(f'A PDF file ({name}) or upload id ({name}_id) is required')
+    return upload
+
+NO_DIFF_HTML = '<div class="alert alert-info text-center">No differences found.</div>'
+
+def diff_pasted_texts(text1, text2):
+    """Highlight the pasted texts, aligning their lines first if requested."""
+    backend = app.config['TEXT_DIFF_BACKEND']
+    if request.form.get('align_lines'):
+        return highlight_aligned_text_diff(text1, text2, backend=backend)
+    return highlight_text_diff(text1, text2, backend=backend)
+
+def stream_pasted_diff(text1, text2):
+    """Stream the comparison as NDJSON, one line per hunk of rows.
+    
+    The first line carries the empty result layout ('layout'), then each
+    hunk's HTML is appended to the two text panes, and a final line reports
+    whether anything differed ('done', 'has_diff').
+    """
+    align = bool(request.form.get('align_lines'))
+    backend = app.config['TEXT_DIFF_BACKEND']
+    
+    def generate():
+        yield json.dumps({'layout': render_comparison_html('', ''), 'no_diff_html': NO_DIFF_HTML}) + '\n'
+        for hunk in iter_diff_hunks(text1, text2, align=align, backend=backend):
+            yield json.dumps(hunk) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def ajax_diff_response(text1, text2):
+    """Response for an AJAX comparison: streamed if the client accepts NDJSON."""
+    if 'application/x-ndjson' in request.headers.get('Accept', ''):
+        return stream_pasted_diff(text1, text2)
+    
+    highlighted1_html, highlighted2_html, has_diff = diff_pasted_texts(text1, text2)
+    if not has_diff:
+        return {
+            'status': 'success',
+            'html': NO_DIFF_HTML
+        }, 200, {'Content-Type': 'application/json'}
+    
+    return {
+        'status': 'success',
+        'html': render_comparison_html(highlighted1_html, highlighted2_html)
+    }, 200, {'Content-Type': 'application/json'}
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -45,112 +162,12 @@ def upload_files():
         flash('Both text inputs are required', 'error')
         return redirect(request.url)
 
-    # For AJAX requests, return JSON response
+    # For AJAX requests, return JSON (or streamed NDJSON) response
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        # Import the highlight_text_diff function
-        import difflib
-        
-        def normalize_whitespace(text):
-            # Replace all whitespace sequences with a single space and strip leading/trailing spaces
-            return ' '.join(text.split())
-
-        def highlight_text_diff(a, b, color):
-            # Normalize whitespace in input strings
-            a_normalized = normalize_whitespace(a)
-            b_normalized = normalize_whitespace(b)
-            
-            # Split into words for comparison
-            a_words = a_normalized.split()
-            b_words = b_normalized.split()
-            
-            # Create a matcher that ignores whitespace
-            matcher = difflib.SequenceMatcher(lambda x: x == ' ', a_words, b_words, autojunk=False)
-            
-            # For the original text (to preserve formatting in display)
-            a_original = a.split()
-            b_original = b.split()
-            
-            result = []
-            
-            # Process each opcode from the matcher
-            for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
-                if opcode == 'equal':
-                    # For equal parts, use the original text (not normalized)
-                    words = a_original[i1:i2] if color == 'red' else b_original[j1:j2]
-                    result.extend(words)
-                elif opcode == 'delete' and color == 'red':
-                    # Highlight deletions in red
-                    for word in a_original[i1:i2]:
-                        result.append(f'<span style="background:#f8d7da;color:#721c24;">{word}</span>')
-                elif opcode == 'insert' and color == 'green':
-                    # Highlight insertions in green
-                    for word in b_original[j1:j2]:
-                        result.append(f'<span style="background:#d4edda;color:#155724;">{word}</span>')
-                elif opcode == 'replace':
-                    if color == 'red':
-                        for word in a_original[i1:i2]:
-                            result.append(f'<span style="background:#f8d7da;color:#721c24;">{word}</span>')
-                    elif color == 'green':
-                        for word in b_original[j1:j2]:
-                            result.append(f'<span style="background:#d4edda;color:#155724;">{word}</span>')
-            
-            # Join with a single space to ensure consistent spacing in the output
-            return ' '.join(result)
-
-        lines1 = text1.splitlines()
-        lines2 = text2.splitlines()
-        max_lines = max(len(lines1), len(lines2))
-        highlighted1 = []
-        highlighted2 = []
-        has_diff = False
-        
-        for i in range(max_lines):
-            l1 = lines1[i] if i < len(lines1) else ''
-            l2 = lines2[i] if i < len(lines2) else ''
-            h1 = highlight_text_diff(l1, l2, 'red')
-            h2 = highlight_text_diff(l1, l2, 'green')
-            if h1 != l1 or h2 != l2:
-                has_diff = True
-            highlighted1.append(h1)
-            highlighted2.append(h2)
-
-        # Prepare the comparison result HTML
-        highlighted1_html = '\n'.join(highlighted1)
-        highlighted2_html = '\n'.join(highlighted2)
-        
-        compare_html = f'''<div class="comparison-result">
-            <div class="row">
-                <div class="col-md-6">
-                    <div class="card">
-                        <div class="card-header bg-primary text-white">First Text (with highlights)</div>
-                        <div class="card-body" style="white-space: pre-wrap;">{highlighted1_html}</div>
-                    </div>
-                </div>
-                <div class="col-md-6">
-                    <div class="card">
-                        <div class="card-header bg-success text-white">Second Text (with highlights)</div>
-                        <div class="card-body" style="white-space: pre-wrap;">{highlighted2_html}</div>
-                    </div>
-                </div>
-            </div>
-            <div class="text-center mt-4">
-                <a href="/" class="btn btn-secondary">New Comparison</a>
-            </div>
-        </div>'''
-        
-        if not has_diff:
-            return {
-                'status': 'success',
-                'html': '<div class="alert alert-info text-center">No differences found.</div>'
-            }, 200, {'Content-Type': 'application/json'}
-        
-        return {
-            'status': 'success',
-            'html': compare_html
-        }, 200, {'Content-Type': 'application/json'}
+        return ajax_diff_response(text1, text2)
     
     # For non-AJAX requests, render the result directly
-    return compare(text1, text2)
+    return compare()
 
 @app.route('/compare', methods=['POST'])
 def compare():
@@ -162,91 +179,143 @@ def compare():
         flash('Both text inputs are required', 'error')
         return redirect(url_for('index'))
 
-    # --- Highlight differences in the original texts ---
-    import difflib
-    def highlight_text_diff(a, b, color):
-        matcher = difflib.SequenceMatcher(None, a.split(), b.split())
-        result = []
-        for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
-            if opcode == 'equal':
-                # For 'equal' opcode, show the words from the text being processed
-                words = a.split()[i1:i2] if color == 'red' else b.split()[j1:j2]
-                result.extend(words)
-            elif opcode == 'delete' and color == 'red':
-                # Highlight deletions in red (for first text)
-                for word in a.split()[i1:i2]:
-                    result.append(f'<span style="background:#f8d7da;color:#721c24;">{word}</span>')
-            elif opcode == 'insert' and color == 'green':
-                # Highlight insertions in green (for second text)
-                for word in b.split()[j1:j2]:
-                    result.append(f'<span style="background:#d4edda;color:#155724;">{word}</span>')
-            elif opcode == 'replace':
-                if color == 'red':
-                    # For first text, show replaced/deleted words in red
-                    for word in a.split()[i1:i2]:
-                        result.append(f'<span style="background:#f8d7da;color:#721c24;">{word}</span>')
-                elif color == 'green':
-                    # For second text, show new words in green
-                    for word in b.split()[j1:j2]:
-                        result.append(f'<span style="background:#d4edda;color:#155724;">{word}</span>')
-        return ' '.join(result)
-
-    lines1 = text1.splitlines()
-    lines2 = text2.splitlines()
-    max_lines = max(len(lines1), len(lines2))
-    highlighted1 = []
-    highlighted2 = []
-    has_diff = False
-    for i in range(max_lines):
-        l1 = lines1[i] if i < len(lines1) else ''
-        l2 = lines2[i] if i < len(lines2) else ''
-        h1 = highlight_text_diff(l1, l2, 'red')  # First text: highlight what's in text1 but not in text2
-        h2 = highlight_text_diff(l1, l2, 'green')  # Second text: highlight what's in text2 but not in text1
-        if h1 != l1 or h2 != l2:
-            has_diff = True
-        highlighted1.append(h1)
-        highlighted2.append(h2)
-
-    # Prepare the comparison result HTML
-    highlighted1_html = '\n'.join(highlighted1)
-    highlighted2_html = '\n'.join(highlighted2)
-    
-    compare_html = f'''<div class="comparison-result">
-        <div class="row">
-            <div class="col-md-6">
-                <div class="card">
-                    <div class="card-header bg-primary text-white">First Text (with highlights)</div>
-                    <div class="card-body" style="white-space: pre-wrap;">{highlighted1_html}</div>
-                </div>
-            </div>
-            <div class="col-md-6">
-                <div class="card">
-                    <div class="card-header bg-success text-white">Second Text (with highlights)</div>
-                    <div class="card-body" style="white-space: pre-wrap;">{highlighted2_html}</div>
-                </div>
-            </div>
-        </div>
-        <div class="text-center mt-4">
-            <a href="/" class="btn btn-secondary">New Comparison</a>
-        </div>
-    </div>'''
-    
-    # If AJAX request, return the comparison result as JSON
+    # If AJAX request, return the comparison result as JSON (or streamed NDJSON)
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        if not has_diff:
-            return {
-                'status': 'success',
-                'html': '<div class="alert alert-info text-center">No differences found.</div>'
-            }, 200, {'Content-Type': 'application/json'}
-        
-        return {
-            'status': 'success',
-            'html': compare_html
-        }, 200, {'Content-Type': 'application/json'}
+        return ajax_diff_response(text1, text2)
+    
+    # --- Highlight differences in the original texts ---
+    highlighted1_html, highlighted2_html, has_diff = diff_pasted_texts(text1, text2)
+    compare_html = render_comparison_html(highlighted1_html, highlighted2_html)
 
     # For non-AJAX, render the same in result.html
     return render_template('result.html', comparison_result=compare_html)
 
+def page_image_response(pdf_path, page, fmt, doc_hash=None):
+    """Serve page `page` (1-based) of a PDF as an image at the requested zoom.
+    
+    Images are content-addressed, so browsers may cache them for good and
+    revalidate with the ETag.
+    """
+    try:
+        zoom = float(request.args.get('zoom', 1))
+        data, key = page_renderer.render(pdf_path, page - 1, zoom, fmt, doc_hash=doc_hash)
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+    except (IndexError, FileNotFoundError):
+        return {'status': 'error', 'message': f'No page {page}'}, 404
+    response = Response(data, mimetype=IMAGE_FORMATS[fmt])
+    response.set_etag(f'{key}.{fmt}')
+    response.cache_control.public = True
+    response.cache_control.max_age = 7 * 24 * 3600
+    return response.make_conditional(request)
+
+def job_response(job):
+    """JSON view of a job record with links to poll and download it."""
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'pages_done': job['pages_done'],
+        'pages_total': job['pages_total'],
+        'error': job['error'],
+        'status_url': url_for('job_status', job_id=job['id']),
+        'result_url': url_for('job_result', job_id=job['id']) if job['status'] == DONE else None,
+        'view_url': url_for('job_view', job_id=job['id']) if job['status'] == DONE else None,
+    }
+
+@app.route('/uploads', methods=['POST'])
+def upload_pdf():
+    try:
+        upload = stored_upload('pdf')
+    except InvalidUploadError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+    return upload_store.info(upload.id), 201
+
+@app.route('/uploads/<upload_id>')
+def upload_info(upload_id):
+    if upload_store.get(upload_id) is None:
+        return {'status': 'error', 'message': 'Unknown upload'}, 404
+    return upload_store.info(upload_id)
+
+@app.route('/uploads/<upload_id>/pages/<int:page>.<fmt>')
+def upload_page_image(upload_id, page, fmt):
+    upload = upload_store.get(upload_id)
+    if upload is None:
+        return {'status': 'error', 'message': 'Unknown upload'}, 404
+    # The upload id is already the file's SHA-256
+    return page_image_response(upload.path, page, fmt, doc_hash=upload.id)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        pdf1 = stored_upload('pdf1')
+        pdf2 = stored_upload('pdf2')
+    except InvalidUploadError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+
+    # Optional comma separated list of italic words to highlight
+    italic_words = [w.strip() for w in request.form.get('specific_italic_words', '').split(',') if w.strip()]
+    mode = request.form.get('mode', 'page')
+    if mode not in COMPARE_MODES:
+        return {'status': 'error', 'message': f'Unknown mode: {mode}'}, 400
+
+    try:
+        job = job_queue.submit(pdf1, pdf2, specific_italic_words=italic_words or None, mode=mode)
+    except QueueFullError as e:
+        return {'status': 'error', 'message': str(e)}, 503, {'Retry-After': '30'}
+    return job_response(job), 202, {'Location': url_for('job_status', job_id=job['id'])}
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return {'status': 'error', 'message': 'Unknown job'}, 404
+    return job_response(job)
+
+def finished_job_result(job_id):
+    """Return (result path, None) for a finished job, or (None, error response)."""
+    job = job_queue.status(job_id)
+    if job is None:
+        return None, ({'status': 'error', 'message': 'Unknown job'}, 404)
+    if job['status'] != DONE:
+        return None, ({'status': 'error', 'message': f"Job is {job['status']}"}, 409)
+    return job_queue.store.result_path(job_id), None
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    result_path, error = finished_job_result(job_id)
+    if error:
+        return error
+    return send_file(result_path, mimetype='application/pdf',
+                     as_attachment=True, download_name=f'comparison_{job_id}.pdf')
+
+@app.route('/jobs/<job_id>/pages/<int:page>.<fmt>')
+def job_page_image(job_id, page, fmt):
+    result_path, error = finished_job_result(job_id)
+    if error:
+        return error
+    return page_image_response(result_path, page, fmt)
+
+@app.route('/jobs/<job_id>/view')
+def job_view(job_id):
+    """Side-by-side viewer whose page images are only loaded when scrolled to."""
+    result_path, error = finished_job_result(job_id)
+    if error:
+        return error
+    zoom = request.args.get('zoom', 1, type=float)
+    if zoom not in ZOOM_LEVELS:
+        zoom = 1
+    fmt = 'webp' if 'webp' in IMAGE_FORMATS else 'png'
+    return render_template('viewer.html', job_id=job_id, zoom=zoom, zoom_levels=ZOOM_LEVELS, fmt=fmt,
+                           page_sizes=page_renderer.page_sizes(result_path))
+
+@app.route('/jobs/metrics')
+def job_metrics():
+    return job_queue.metrics()
+
+@app.route('/pages/metrics')
+def page_image_metrics():
+    return page_renderer.stats()
+
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,267 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import time
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from compare_stats import CompareStats
+from extraction_index import IndexStore
+from pdf_compare import COMPARE_MODES, HIGHLIGHT_STYLES, iter_compare_pdfs, page_differs
+from result_cache import file_sha256
+
+def read_manifest(manifest_path):
+    """Read (pdf1, pdf2, output) pairs from a CSV or JSONL manifest.
+
+    CSV files need a header with pdf1 and pdf2 columns (output optional);
+    JSONL files hold one object per line with the same keys. Relative paths
+    are resolved against the manifest's folder.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        if manifest_path.lower().endswith(('.jsonl', '.json')):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    pairs = []
+    for line_num, row in enumerate(rows, 1):
+        if not row.get('pdf1') or not row.get('pdf2'):
+            raise ValueError(f'{manifest_path}: entry {line_num} needs pdf1 and pdf2')
+        output = row.get('output') or None
+        pairs.append((
+            os.path.join(base_dir, row['pdf1']),
+            os.path.join(base_dir, row['pdf2']),
+            os.path.join(base_dir, output) if output else None,
+        ))
+    return pairs
+
+def pair_directories(dir1, dir2):
+    """Pair the PDFs of dir1 and dir2 that have the same name.
+
+    Files found in only one of the folders are still paired (with the
+    missing path on the other side), so they are reported as failures in
+    the batch summary rather than silently dropped.
+    """
+    names = {name for folder in (dir1, dir2) for name in os.listdir(folder)
+             if name.lower().endswith('.pdf')}
+    return [(os.path.join(dir1, name), os.path.join(dir2, name), None) for name in sorted(names)]
+
+def default_output_path(output_dir, pdf1_path, pdf2_path, unique=False):
+    """Name a pair's output after its two files.
+
+    With unique=True a short hash of both full paths is added, which tells
+    apart pairs of same-named files from different folders (v1/a.pdf vs
+    v2/a.pdf and v2/a.pdf vs v3/a.pdf).
+    """
+    stem1 = os.path.splitext(os.path.basename(pdf1_path))[0]
+    stem2 = os.path.splitext(os.path.basename(pdf2_path))[0]
+    name = f'{stem1}__vs__{stem2}'
+    if unique:
+        paths = f'{os.path.abspath(pdf1_path)}\0{os.path.abspath(pdf2_path)}'
+        name += '__' + hashlib.sha256(paths.encode()).hexdigest()[:8]
+    return os.path.join(output_dir, name + '.pdf')
+
+def assign_output_paths(pairs, output_dir):
+    """Fill in the default output path of pairs that have none.
+
+    Pairs whose default names would clash all get the unique form, so the
+    names do not depend on the order of the pairs.
+    """
+    names = [default_output_path(output_dir, pdf1, pdf2) for pdf1, pdf2, _ in pairs]
+    counts = {}
+    for (_, _, output), name in zip(pairs, names):
+        key = os.path.normcase(os.path.abspath(output or name))
+        counts[key] = counts.get(key, 0) + 1
+    assigned = []
+    for (pdf1, pdf2, output), name in zip(pairs, names):
+        if output is None:
+            clash = counts[os.path.normcase(os.path.abspath(name))] > 1
+            output = default_output_path(output_dir, pdf1, pdf2, unique=True) if clash else name
+        assigned.append((pdf1, pdf2, output))
+    return assigned
+
+def _hash_file(pdf_path):
+    """Hash one input file (runs in a pool worker). Returns (path, digest, error)."""
+    try:
+        return pdf_path, file_sha256(pdf_path), None
+    except Exception as e:
+        return pdf_path, None, str(e)
+
+def _index_file(index_dir, pdf_path, digest):
+    """Build one file's extraction index (runs in a pool worker)."""
+    try:
+        IndexStore(index_dir).ensure(pdf_path, digest)
+        return digest, None
+    except Exception as e:
+        return digest, str(e)
+
+def _compare_pair(pdf1_path, pdf2_path, output_path, index_paths, options):
+    """Compare one pair (runs in a pool worker) and return its summary."""
+    summary = {
+        'pdf1': pdf1_path,
+        'pdf2': pdf2_path,
+        'output': output_path,
+        'status': 'ok',
+        'error': None,
+    }
+    if options.get('summary_only'):
+        summary['output'] = output_path = None
+    stats = CompareStats()
+    start = time.perf_counter()
+    try:
+        pages = 0
+        changed_pages = []
+        removed = added = 0
+        results = iter_compare_pdfs(pdf1_path, pdf2_path, output_path, stats=stats,
+                                    index_paths=index_paths, **options)
+        for result in results:
+            pages = result['page_count']
+            if page_differs(result):
+                changed_pages.append(result['page_num'] + 1)
+            removed += len(result['removed_words'])
+            added += len(result['added_words'])
+        summary.update({
+            'pages': pages,
+            'changed_pages': changed_pages,
+            'removed_words': removed,
+            'added_words': added,
+        })
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        summary['traceback'] = traceback.format_exc()
+    summary['seconds'] = round(time.perf_counter() - start, 4)
+    summary['timings'] = {stage: round(seconds, 4) for stage, seconds in stats.timings.items()}
+    summary['counters'] = stats.counters
+    return summary
+
+def run_batch(pairs, output_dir, summary_path=None, workers=None, index_dir=None, **options):
+    """Compare many PDF pairs in one process pool.
+
+    Every distinct input file is extracted once into an extraction index
+    (index_dir, or a temporary folder) which all its comparisons reuse.
+    One JSON summary line per pair (diff counts, timings, errors) is
+    written to summary_path as pairs finish. Extra keyword arguments are
+    passed to iter_compare_pdfs. Returns the list of summaries.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if summary_path is None:
+        summary_path = os.path.join(output_dir, 'summary.jsonl')
+    temp_index = None
+    if index_dir is None:
+        temp_index = tempfile.TemporaryDirectory(prefix='pdf_compare_index_')
+        index_dir = temp_index.name
+
+    summaries = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool, open(summary_path, 'w') as summary_file:
+            # Extract each distinct content once, however many pairs or
+            # identical copies use it (indexes are named by content hash)
+            unique_files = sorted({path for pdf1, pdf2, _ in pairs for path in (pdf1, pdf2)})
+            index_errors = {}
+            digest_of = {}
+            paths_by_digest = {}
+            for pdf_path, digest, error in pool.map(_hash_file, unique_files):
+                if error is not None:
+                    index_errors[pdf_path] = error
+                else:
+                    digest_of[pdf_path] = digest
+                    paths_by_digest.setdefault(digest, []).append(pdf_path)
+            digests = list(paths_by_digest)
+            first_paths = [paths_by_digest[digest][0] for digest in digests]
+            for digest, error in pool.map(_index_file, [index_dir] * len(digests), first_paths, digests):
+                if error is not None:
+                    for pdf_path in paths_by_digest[digest]:
+                        index_errors[pdf_path] = error
+            print(f'Extracted {len(digests)} distinct of {len(unique_files)} files'
+                  f' ({len(index_errors)} failed)')
+
+            store = IndexStore(index_dir)
+            futures = []
+            outputs = set()
+            for pdf1_path, pdf2_path, output_path in assign_output_paths(pairs, output_dir):
+                failed_input = next((p for p in (pdf1_path, pdf2_path) if p in index_errors), None)
+                output_key = os.path.normcase(os.path.abspath(output_path))
+                error = None
+                if failed_input is not None:
+                    error = f'Could not extract {failed_input}: {index_errors[failed_input]}'
+                elif output_key in outputs and not options.get('summary_only'):
+                    # Two workers must never write the same file
+                    error = f'Output {output_path} is already written by another pair'
+                if error is not None:
+                    summary = {
+                        'pdf1': pdf1_path,
+                        'pdf2': pdf2_path,
+                        'output': None,
+                        'status': 'failed',
+                        'error': error,
+                    }
+                    summaries.append(summary)
+                    summary_file.write(json.dumps(summary) + '\n')
+                    print(f"{pdf1_path} vs {pdf2_path}: failed - {error}")
+                    continue
+                outputs.add(output_key)
+                # The indexes are already built, so the pair need not hash its inputs again
+                index_paths = (store.index_path(digest_of[pdf1_path]), store.index_path(digest_of[pdf2_path]))
+                futures.append(pool.submit(_compare_pair, pdf1_path, pdf2_path, output_path,
+                                           index_paths, options))
+
+            for future in futures:
+                summary = future.result()
+                summaries.append(summary)
+                summary_file.write(json.dumps(summary) + '\n')
+                summary_file.flush()
+                if summary['status'] == 'ok':
+                    print(f"{summary['pdf1']} vs {summary['pdf2']}: "
+                          f"{len(summary['changed_pages'])} changed pages ({summary['seconds']:.2f} s)")
+                else:
+                    print(f"{summary['pdf1']} vs {summary['pdf2']}: failed - {summary['error']}")
+    finally:
+        if temp_index is not None:
+            temp_index.cleanup()
+
+    failed = sum(1 for summary in summaries if summary['status'] != 'ok')
+    print(f'\nCompared {len(summaries) - failed} of {len(summaries)} pairs, summary: {summary_path}')
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare many pairs of PDF files in one run')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest',
+                        help='CSV (columns pdf1,pdf2[,output]) or JSONL file listing the pairs')
+    source.add_argument('--dirs', nargs=2, metavar=('DIR1', 'DIR2'),
+                        help='Compare every PDF in DIR1 with the file of the same name in DIR2')
+    parser.add_argument('--output-dir', default='batch_output',
+                        help='Where to write comparison PDFs and the summary (default: batch_output)')
+    parser.add_argument('--summary',
+                        help='Path of the JSONL summary (default: OUTPUT_DIR/summary.jsonl)')
+    parser.add_argument('--workers', type=int,
+                        help='Number of processes shared by all pairs (default: CPU count)')
+    parser.add_argument('--mode', choices=COMPARE_MODES, default='page',
+                        help='Compare page by page or align whole documents (default: page)')
+    parser.add_argument('--highlight-style', choices=HIGHLIGHT_STYLES, default='merged',
+                        help='How differences are highlighted (default: merged)')
+    parser.add_argument('--index-dir',
+                        help='Keep extraction indexes in this directory instead of a temporary one')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='Only report which pages differ, without writing comparison PDFs')
+
+    args = parser.parse_args()
+    if args.manifest:
+        pairs = read_manifest(args.manifest)
+    else:
+        pairs = pair_directories(*args.dirs)
+    summaries = run_batch(pairs, args.output_dir, summary_path=args.summary,
+                          workers=args.workers, index_dir=args.index_dir,
+                          mode=args.mode, highlight_style=args.highlight_style,
+                          summary_only=args.summary_only)
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""End-to-end benchmark for compare_pdfs on synthetic documents.
+
+Generates PDF pairs with the requested page counts, words per page and
+edit rate, runs each comparison in a fresh process and reports per-stage
+timings (from CompareStats), counters and peak memory.
+
+    python benchmarks/bench_compare_pdfs.py --pages 10 100 --words-per-page 400 --edit-rate 0.02
+
+--changed-pages limits the edits to that fraction of the pages, which
+models revision cycles where most pages are unchanged; --summary-only
+times summarize_differences instead of building the comparison PDF.
+
+Before timing, a document is checked against a copy with one extra page:
+in both modes the extra page must be reported as changed.
+
+Peak RSS is that of the comparing process; with --workers > 1 the page
+workers' memory is not included.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compare_stats import CompareStats
+from pdf_compare import COMPARE_MODES, HIGHLIGHT_STYLES, compare_pdfs, summarize_differences
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 40
+WORDS_PER_LINE = 12
+
+
+def make_vocabulary(size=3000, seed=7):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(size)]
+
+
+def edit_words(words, edit_rate, rng, vocabulary):
+    """Replace, delete or insert words with the given probability."""
+    edited = []
+    for word in words:
+        if rng.random() >= edit_rate:
+            edited.append(word)
+            continue
+        action = rng.randrange(3)
+        if action == 0:
+            edited.append(rng.choice(vocabulary))
+        elif action == 2:
+            edited.append(word)
+            edited.append(rng.choice(vocabulary))
+    return edited
+
+
+def write_pdf(path, pages):
+    """Write one page per word list, wrapped into lines of WORDS_PER_LINE."""
+    doc = fitz.open()
+    for words in pages:
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        lines = [' '.join(words[i:i + WORDS_PER_LINE]) for i in range(0, len(words), WORDS_PER_LINE)]
+        line_height = min(14, (PAGE_HEIGHT - 2 * MARGIN) / max(1, len(lines)))
+        page.insert_text((MARGIN, MARGIN + line_height), '\n'.join(lines),
+                         fontsize=line_height / 1.2, lineheight=1.2)
+    doc.save(path)
+    doc.close()
+
+
+def generate_pair(directory, num_pages, words_per_page, edit_rate, changed_pages=1.0, seed=0):
+    """Create a synthetic original/edited PDF pair and return their paths."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary()
+    pages1 = [[rng.choice(vocabulary) for _ in range(words_per_page)] for _ in range(num_pages)]
+    pages2 = [
+        edit_words(words, edit_rate, rng, vocabulary) if rng.random() < changed_pages else list(words)
+        for words in pages1
+    ]
+    pdf1_path = os.path.join(directory, f'synthetic_{num_pages}_1.pdf')
+    pdf2_path = os.path.join(directory, f'synthetic_{num_pages}_2.pdf')
+    write_pdf(pdf1_path, pages1)
+    write_pdf(pdf2_path, pages2)
+    return pdf1_path, pdf2_path
+
+
+def check_extra_page(directory, num_pages=3, words_per_page=200, seed=1):
+    """A page only one document has must be reported as changed."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary()
+    pages = [[rng.choice(vocabulary) for _ in range(words_per_page)] for _ in range(num_pages + 1)]
+    pdf1_path = os.path.join(directory, 'extra_page_1.pdf')
+    pdf2_path = os.path.join(directory, 'extra_page_2.pdf')
+    write_pdf(pdf1_path, pages[:num_pages])
+    write_pdf(pdf2_path, pages)
+    for mode in COMPARE_MODES:
+        for first, second, key in ((pdf1_path, pdf2_path, 'added_words'), (pdf2_path, pdf1_path, 'removed_words')):
+            summary = summarize_differences(first, second, mode=mode)
+            if summary['changed_pages'] != [num_pages + 1] or summary[key] != words_per_page:
+                raise AssertionError(f'Extra page not reported in {mode} mode: {summary}')
+    print(f'Extra page check passed ({", ".join(COMPARE_MODES)} modes)')
+
+
+def run_comparison(pdf1_path, pdf2_path, output_path, options, summary_only=False):
+    """Run one comparison in this (fresh) process and report its stats."""
+    stats = CompareStats()
+    start = time.perf_counter()
+    if summary_only:
+        summarize_differences(pdf1_path, pdf2_path, workers=options['workers'], mode=options['mode'],
+                              stats=stats)
+        size = 0
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            compare_pdfs(pdf1_path, pdf2_path, output_path, stats=stats, **options)
+        size = os.path.getsize(output_path)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return elapsed, peak_mb, size, stats.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compare_pdfs on synthetic PDFs')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--edit-rate', type=float, default=0.02)
+    parser.add_argument('--changed-pages', type=float, default=1.0,
+                        help='Fraction of pages that get edits (default: 1.0)')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='Only report changed pages instead of writing the comparison PDF')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--mode', choices=COMPARE_MODES, default='page')
+    parser.add_argument('--highlight-style', choices=HIGHLIGHT_STYLES, default='merged')
+    args = parser.parse_args()
+
+    options = {'workers': args.workers, 'mode': args.mode, 'highlight_style': args.highlight_style}
+    # A fresh interpreter per run so peak RSS is not inherited from earlier runs
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        check_extra_page(tmp_dir)
+        for num_pages in args.pages:
+            pdf1_path, pdf2_path = generate_pair(tmp_dir, num_pages, args.words_per_page, args.edit_rate,
+                                                 args.changed_pages)
+            output_path = os.path.join(tmp_dir, 'result.pdf')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                elapsed, peak_mb, size, data = pool.submit(
+                    run_comparison, pdf1_path, pdf2_path, output_path, options,
+                    args.summary_only).result()
+
+            print(f'\n{num_pages} pages x {args.words_per_page} words, edit rate {args.edit_rate}: '
+                  f'{elapsed:.2f} s, peak RSS {peak_mb:.0f} MB, output {size / 1024:.0f} KB')
+            for stage, seconds in sorted(data['timings'].items(), key=lambda item: -item[1]):
+                print(f'  {stage:<16} {seconds * 1000:>10.1f} ms')
+            for counter, amount in sorted(data['counters'].items()):
+                print(f'  {counter:<16} {amount:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Equivalence check and benchmark for the word diff backends of text_diff.
+
+Every available backend (text_diff.DIFF_BACKENDS) is run on the same
+inputs and checked against difflib, the reference:
+
+- cydifflib is a C build of difflib's algorithm, so its highlighted HTML
+  must be identical.
+- myers computes a minimal diff. Where a repeated word can be matched in
+  more than one place it may highlight a different, equally short set of
+  words, so it is checked row by row instead: the same text on both sides,
+  the same rows marked as changed, the words it leaves unhighlighted must
+  be common to both lines, and it must not highlight more words than
+  difflib.
+
+Then each backend is timed on short pasted lines and on long lines of
+repetitive boilerplate, where SequenceMatcher is slowest.
+
+    python benchmarks/bench_diff_backends.py
+"""
+import os
+import random
+import re
+import sys
+import time
+from html import unescape
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_diff import DIFF_BACKENDS, highlight_aligned_text_diff, highlight_text_diff, iter_diff_rows
+
+# Backends implementing difflib's own algorithm must match it exactly
+EXACT_BACKENDS = {'difflib', 'cydifflib'}
+BOILERPLATE_WORDS = [1000, 4000]
+
+SPAN_RE = re.compile(r'<span class="diff-(?:removed|added)">(.*?)</span>|([^<]+)')
+VOCABULARY = ['the', 'party', 'shall', 'agreement', 'notice', 'of', 'and', 'to',
+              'in', 'any', 'such', 'provided', 'that', 'company', 'terms', 'date']
+
+
+def parse_row(html):
+    """Return [(word, highlighted)] for one rendered line (None if absent)."""
+    if html is None:
+        return None
+    words = []
+    for match in SPAN_RE.finditer(html):
+        highlighted = match.group(1) is not None
+        text = match.group(1) if highlighted else match.group(2)
+        words.extend((word, highlighted) for word in unescape(text).split())
+    return words
+
+
+def check_rows(name, expected_rows, rows, label):
+    """Check a minimal-diff backend's rows against difflib's rows."""
+    if len(rows) != len(expected_rows):
+        raise AssertionError(f'{name}: {len(rows)} rows, difflib has {len(expected_rows)} ({label})')
+    reordered = 0
+    for row_num, (expected, row) in enumerate(zip(expected_rows, rows)):
+        if row[2] != expected[2]:
+            raise AssertionError(f'{name}: row {row_num} changed={row[2]}, difflib says {expected[2]} ({label})')
+        sides = [parse_row(html) for html in row[:2]]
+        expected_sides = [parse_row(html) for html in expected[:2]]
+        for words, expected_words in zip(sides, expected_sides):
+            if (words is None) != (expected_words is None):
+                raise AssertionError(f'{name}: row {row_num} has a missing side ({label})')
+            if words is None:
+                continue
+            if [w for w, _ in words] != [w for w, _ in expected_words]:
+                raise AssertionError(f'{name}: row {row_num} text differs from difflib ({label})')
+            if sum(h for _, h in words) > sum(h for _, h in expected_words):
+                raise AssertionError(f'{name}: row {row_num} highlights more words than difflib ({label})')
+        if None not in sides:
+            # Unhighlighted words are the matched ones: one common subsequence
+            kept1 = [w for w, h in sides[0] if not h]
+            kept2 = [w for w, h in sides[1] if not h]
+            if kept1 != kept2:
+                raise AssertionError(f'{name}: row {row_num} is not a valid diff ({label})')
+        reordered += sides != expected_sides
+    return reordered
+
+
+def make_lines(num_lines, words_per_line, edit_rate, rng):
+    lines1 = []
+    lines2 = []
+    for _ in range(num_lines):
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(*words_per_line))]
+        lines1.append(' '.join(words))
+        if rng.random() < edit_rate:
+            words = list(words)
+            words[rng.randrange(len(words))] = 'amended'
+            del words[rng.randrange(len(words))]
+            words.insert(rng.randrange(len(words) + 1), rng.choice(VOCABULARY))
+        lines2.append(' '.join(words))
+    return '\n'.join(lines1), '\n'.join(lines2)
+
+
+def make_boilerplate(num_words, rng, edits=20):
+    """One long line of repeated clauses with a few words changed."""
+    clause = 'the party shall give notice of any such terms to the company'.split()
+    words = (clause * (num_words // len(clause) + 1))[:num_words]
+    edited = list(words)
+    for _ in range(edits):
+        edited[rng.randrange(len(edited))] = 'amended'
+    return ' '.join(words), ' '.join(edited)
+
+
+def best_of(func, *args, repeat=3, **kwargs):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def check_equivalence(cases):
+    backends = sorted(DIFF_BACKENDS)
+    reordered = dict.fromkeys(backends, 0)
+    rows_checked = 0
+    for label, text1, text2 in cases:
+        for align in (False, True):
+            expected_rows = list(iter_diff_rows(text1, text2, align, 'difflib'))
+            highlight = highlight_aligned_text_diff if align else highlight_text_diff
+            expected = highlight(text1, text2)
+            rows_checked += len(expected_rows)
+            for name in backends:
+                if name in EXACT_BACKENDS:
+                    if highlight(text1, text2, backend=name) != expected:
+                        raise AssertionError(f'{name}: output differs from difflib ({label}, align={align})')
+                else:
+                    rows = list(iter_diff_rows(text1, text2, align, name))
+                    reordered[name] += check_rows(name, expected_rows, rows, f'{label}, align={align}')
+    print(f'Backends: {", ".join(backends)}; {rows_checked} rows checked against difflib')
+    for name in backends:
+        if name not in EXACT_BACKENDS:
+            print(f'  {name}: valid diffs, never more words highlighted than difflib; '
+                  f'{reordered[name]} rows highlighted in other places')
+
+
+def main():
+    rng = random.Random(0)
+    cases = []
+    for seed in range(200):
+        text1, text2 = make_lines(rng.randint(1, 30), (1, 20), 0.3, rng)
+        cases.append((f'random {seed}', text1, text2))
+    cases.append(('empty side', 'a b c\nd e', ''))
+    cases.append(('escaping', 'if a < b & c > d', 'if a <= b & c > d'))
+    text1, text2 = make_boilerplate(BOILERPLATE_WORDS[0], rng)
+    cases.append(('boilerplate', text1, text2))
+    check_equivalence(cases)
+
+    print()
+    backends = sorted(DIFF_BACKENDS)
+    print(f'{"input":>24}' + ''.join(f'{name + " (s)":>16}' for name in backends))
+    text1, text2 = make_lines(5000, (8, 20), 0.2, random.Random(1))
+    inputs = [('5000 short lines', text1, text2, 3)]
+    for num_words in BOILERPLATE_WORDS:
+        text1, text2 = make_boilerplate(num_words, random.Random(num_words))
+        inputs.append((f'{num_words}-word boilerplate', text1, text2, 1))
+    for label, text1, text2, repeat in inputs:
+        timings = [best_of(highlight_text_diff, text1, text2, backend=name, repeat=repeat)[0]
+                   for name in backends]
+        print(f'{label:>24}' + ''.join(f'{seconds:>16.4f}' for seconds in timings))
+
+
+if __name__ == '__main__':
+    main()
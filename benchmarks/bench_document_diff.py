@@ -0,0 +1,107 @@
+"""Benchmark for the whole-document word alignment of --mode document.
+
+Times diff_document_words on synthetic word streams: similar documents
+with a few or many edits, unrelated documents, and repetitive boilerplate.
+The alignment's work is bounded (sequence_diff.anchored_matching_blocks),
+so unrelated documents fall back to page-style matching instead of running
+for hours. On the smaller similar inputs, the anchored alignment is also
+checked to match as many words as the exact, unbounded Myers diff.
+
+    python benchmarks/bench_document_diff.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compare_stats import CompareStats
+from pdf_compare import PageWords, diff_document_words
+from sequence_diff import anchored_matching_blocks, intern_tokens, matching_blocks
+
+WORDS_PER_PAGE = 400
+WORDS_PER_LINE = 12
+# Exact Myers is only run this far; it is quadratic on dissimilar input
+EXACT_MAX_WORDS = 20000
+
+
+def make_vocabulary(size=3000, seed=7):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(size)]
+
+
+def edit_words(words, edit_rate, rng, vocabulary):
+    """Replace, delete or insert words with the given probability."""
+    edited = []
+    for word in words:
+        if rng.random() >= edit_rate:
+            edited.append(word)
+            continue
+        action = rng.randrange(3)
+        if action == 0:
+            edited.append(rng.choice(vocabulary))
+        elif action == 2:
+            edited.append(word)
+            edited.append(rng.choice(vocabulary))
+    return edited
+
+
+def to_pages(words):
+    """Split a word stream into PageWords pages of WORDS_PER_PAGE words."""
+    pages = []
+    for start in range(0, len(words), WORDS_PER_PAGE):
+        page = words[start:start + WORDS_PER_PAGE]
+        count = len(page)
+        lines = np.arange(count, dtype=np.intc) // WORDS_PER_LINE
+        pages.append(PageWords(page, np.zeros((count, 4)), lines, np.zeros(count, dtype=bool)))
+    return pages
+
+
+def make_cases(rng, vocabulary):
+    boilerplate = 'the party shall give notice of any such terms to the company'.split()
+    cases = []
+    for num_words, edit_rate in ((20000, 0.05), (20000, 0.2), (100000, 0.05), (100000, 0.3)):
+        words = [rng.choice(vocabulary) for _ in range(num_words)]
+        cases.append((f'{num_words} words, {edit_rate:.0%} edits', words,
+                      edit_words(words, edit_rate, rng, vocabulary)))
+    for num_words in (5000, 10000, 100000):
+        cases.append((f'{num_words} words, unrelated', [rng.choice(vocabulary) for _ in range(num_words)],
+                      [rng.choice(vocabulary) for _ in range(num_words)]))
+    words = (boilerplate * (100000 // len(boilerplate) + 1))[:100000]
+    cases.append(('100000 boilerplate, 5% edits', words,
+                  edit_words(words, 0.05, rng, boilerplate + ['amended'])))
+    return cases
+
+
+def main():
+    rng = random.Random(0)
+    vocabulary = make_vocabulary()
+    print(f'{"input":>30} {"time (s)":>9} {"highlighted":>12} {"unaligned":>10} {"exact (s)":>10}')
+    for label, words1, words2 in make_cases(rng, vocabulary):
+        stats = CompareStats()
+        start = time.perf_counter()
+        results = diff_document_words(to_pages(words1), to_pages(words2), 600, stats=stats)
+        elapsed = time.perf_counter() - start
+        highlighted = sum(len(r['removed_words']) + len(r['added_words']) for r in results)
+
+        exact = ''
+        similar = 'unrelated' not in label and 'boilerplate' not in label
+        if similar and len(words1) <= EXACT_MAX_WORDS:
+            tokens1, tokens2 = intern_tokens(words1, words2)
+            start = time.perf_counter()
+            exact_matched = sum(size for _, _, size in matching_blocks(tokens1, tokens2))
+            exact = f'{time.perf_counter() - start:.2f}'
+            blocks, _ = anchored_matching_blocks(tokens1, tokens2)
+            matched = sum(size for _, _, size in blocks)
+            if matched < exact_matched * 0.99:
+                raise AssertionError(f'{label}: anchored alignment matched {matched} words, '
+                                     f'exact diff {exact_matched}')
+        print(f'{label:>30} {elapsed:>9.2f} {highlighted:>12} '
+              f'{stats.counters.get("unaligned_words", 0):>10} {exact:>10}')
+
+
+if __name__ == '__main__':
+    main()
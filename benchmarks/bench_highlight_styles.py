@@ -0,0 +1,74 @@
+"""Benchmark for writing highlights into the comparison PDF.
+
+For each bundled document pair, builds the output with every highlight
+style and reports annotation count, time to add highlights, save time and
+output size.
+
+    python benchmarks/bench_highlight_styles.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from pdf_compare import HIGHLIGHT_STYLES, add_page_highlights, iter_compare_pdfs
+
+PAIRS = [('doc1.pdf', 'doc2.pdf'), ('doc1.pdf', 'doc3.pdf'), ('doc2.pdf', 'doc3.pdf')]
+# Document mode on a shifted pair gives a heavily highlighted page as well
+MODES = ['page', 'document']
+
+
+def build_output(pdf1_path, pdf2_path, results, style, output_path):
+    """Assemble the side-by-side output like iter_compare_pdfs does."""
+    doc1 = fitz.open(pdf1_path)
+    doc2 = fitz.open(pdf2_path)
+    output_doc = fitz.open()
+    page_width = max(doc1[0].rect.width, doc2[0].rect.width)
+    page_height = max(doc1[0].rect.height, doc2[0].rect.height)
+
+    highlight_time = 0
+    for result in results:
+        page_num = result['page_num']
+        page = output_doc.new_page(width=page_width * 2, height=page_height)
+        if page_num < len(doc1):
+            page.show_pdf_page(fitz.Rect(0, 0, page_width, page_height), doc1, page_num)
+        if page_num < len(doc2):
+            page.show_pdf_page(fitz.Rect(page_width, 0, page_width * 2, page_height), doc2, page_num)
+        start = time.perf_counter()
+        add_page_highlights(page, result['highlights'], style)
+        highlight_time += time.perf_counter() - start
+
+    annots = sum(len(list(page.annots())) for page in output_doc)
+    start = time.perf_counter()
+    output_doc.save(output_path)
+    save_time = time.perf_counter() - start
+    output_doc.close()
+    doc1.close()
+    doc2.close()
+    return annots, highlight_time, save_time, os.path.getsize(output_path)
+
+
+def main():
+    print(f'{"pair":<20} {"mode":<9} {"style":<7} {"highlights":>10} {"annots":>7} '
+          f'{"add (ms)":>9} {"save (ms)":>10} {"size (KB)":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'out.pdf')
+        for name1, name2 in PAIRS:
+            pdf1_path = os.path.join(ROOT, name1)
+            pdf2_path = os.path.join(ROOT, name2)
+            for mode in MODES:
+                results = list(iter_compare_pdfs(pdf1_path, pdf2_path, mode=mode))
+                highlights = sum(len(result['highlights']) for result in results)
+                for style in HIGHLIGHT_STYLES:
+                    annots, highlight_time, save_time, size = build_output(
+                        pdf1_path, pdf2_path, results, style, output_path)
+                    print(f'{name1 + "/" + name2:<20} {mode:<9} {style:<7} {highlights:>10} {annots:>7} '
+                          f'{highlight_time * 1000:>9.1f} {save_time * 1000:>10.1f} {size / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
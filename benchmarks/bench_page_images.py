@@ -0,0 +1,70 @@
+"""Benchmark for the on-demand page images of the result viewer.
+
+Builds a comparison PDF from a synthetic pair, then compares rendering
+every page up front with what a viewer actually pays through
+page_renderer.PageRenderer: the first few pages rendered cold, the same
+pages again from memory, and from disk in a fresh renderer (as after a
+restart or in another worker process). Cached images must be identical
+to freshly rendered ones.
+
+    python benchmarks/bench_page_images.py --pages 400 --viewed 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_compare_pdfs import generate_pair
+from page_renderer import IMAGE_FORMATS, PageRenderer
+from pdf_compare import compare_pdfs
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--viewed', type=int, default=3, help='Pages a viewer looks at')
+    parser.add_argument('--zoom', type=float, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf1_path, pdf2_path = generate_pair(tmp, args.pages, 300, 0.02)
+        result_path = os.path.join(tmp, 'result.pdf')
+        compare_pdfs(pdf1_path, pdf2_path, result_path)
+
+        for fmt in IMAGE_FORMATS:
+            cache_dir = os.path.join(tmp, f'cache_{fmt}')
+            viewed = range(args.viewed)
+
+            def render_pages(renderer, pages):
+                return [renderer.render(result_path, page, args.zoom, fmt)[0] for page in pages]
+
+            all_time, _ = timed(render_pages, PageRenderer(os.path.join(tmp, f'all_{fmt}')), range(args.pages))
+            renderer = PageRenderer(cache_dir)
+            cold_time, cold = timed(render_pages, renderer, viewed)
+            memory_time, from_memory = timed(render_pages, renderer, viewed)
+            disk_renderer = PageRenderer(cache_dir)
+            disk_time, from_disk = timed(render_pages, disk_renderer, viewed)
+
+            if not cold == from_memory == from_disk:
+                raise AssertionError(f'Cached {fmt} images differ from rendered ones')
+            if renderer.renders != args.viewed or disk_renderer.renders != 0:
+                raise AssertionError(f'Cached {fmt} pages were rendered again')
+
+            size = sum(len(data) for data in cold) / len(cold)
+            print(f'{fmt} at zoom {args.zoom:g} ({size / 1024:.0f} KB per page):')
+            print(f'  all {args.pages} pages up front   {all_time:8.3f} s')
+            print(f'  {args.viewed} viewed pages, cold    {cold_time:8.3f} s')
+            print(f'  {args.viewed} viewed pages, memory  {memory_time:8.4f} s')
+            print(f'  {args.viewed} viewed pages, disk    {disk_time:8.4f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Benchmark for the pasted-text comparison used by the web routes.
+
+Compares the previous per-route implementation (two SequenceMatchers per
+line, words re-split for every opcode) with text_diff.highlight_text_diff.
+The old renderer wrapped each word in an inline-styled span while the new one
+wraps each run of words in a class-styled span, so the two are checked to
+mark the same words on every line, and the new one must be at least twice as
+fast on 10k+ lines. It then shows how line alignment (highlight_aligned_text_diff) behaves when a
+single line is inserted at the top of the text, and checks that aligning
+two unrelated texts stays within MAX_ALIGN_SLOWDOWN of pairing their lines
+by index (the line diff's work is bounded).
+
+    python benchmarks/bench_text_diff.py
+"""
+import difflib
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_diff import highlight_aligned_text_diff, highlight_text_diff
+
+LINE_COUNTS = [1000, 10000, 20000]
+# Pasted inputs of 10k+ lines must render at least twice as fast
+MIN_SPEEDUP = 2
+MIN_SPEEDUP_LINES = 10000
+# Aligning unrelated texts may cost at most this much more than pairing by index
+MAX_ALIGN_SLOWDOWN = 5
+
+SPAN_RE = re.compile(r'<span[^>]*>(.*?)</span>|([^<]+)')
+
+
+def old_highlight_text_diff(a, b, color):
+    """The previous /compare implementation, kept here as the reference."""
+    matcher = difflib.SequenceMatcher(None, a.split(), b.split())
+    result = []
+    for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
+        if opcode == 'equal':
+            words = a.split()[i1:i2] if color == 'red' else b.split()[j1:j2]
+            result.extend(words)
+        elif opcode == 'delete' and color == 'red':
+            for word in a.split()[i1:i2]:
+                result.append(f'<span style="background:#f8d7da;color:#721c24;">{word}</span>')
+        elif opcode == 'insert' and color == 'green':
+            for word in b.split()[j1:j2]:
+                result.append(f'<span style="background:#d4edda;color:#155724;">{word}</span>')
+        elif opcode == 'replace':
+            if color == 'red':
+                for word in a.split()[i1:i2]:
+                    result.append(f'<span style="background:#f8d7da;color:#721c24;">{word}</span>')
+            elif color == 'green':
+                for word in b.split()[j1:j2]:
+                    result.append(f'<span style="background:#d4edda;color:#155724;">{word}</span>')
+    return ' '.join(result)
+
+
+def old_render(text1, text2):
+    lines1 = text1.splitlines()
+    lines2 = text2.splitlines()
+    highlighted1 = []
+    highlighted2 = []
+    has_diff = False
+    for i in range(max(len(lines1), len(lines2))):
+        l1 = lines1[i] if i < len(lines1) else ''
+        l2 = lines2[i] if i < len(lines2) else ''
+        h1 = old_highlight_text_diff(l1, l2, 'red')
+        h2 = old_highlight_text_diff(l1, l2, 'green')
+        if h1 != l1 or h2 != l2:
+            has_diff = True
+        highlighted1.append(h1)
+        highlighted2.append(h2)
+    return '\n'.join(highlighted1), '\n'.join(highlighted2), has_diff
+
+
+def marked_words(html):
+    """Return [[(word, highlighted)] per line] for either renderer's output."""
+    lines = []
+    for line in html.split('\n'):
+        words = []
+        for match in SPAN_RE.finditer(line):
+            highlighted = match.group(1) is not None
+            text = match.group(1) if highlighted else match.group(2)
+            words.extend((word, highlighted) for word in text.split())
+        lines.append(words)
+    return lines
+
+
+def same_result(expected, result):
+    """Both sides mark the same words, and has_diff agrees."""
+    return (expected[2] == result[2] and
+            all(marked_words(e) == marked_words(r) for e, r in zip(expected[:2], result[:2])))
+
+
+def make_texts(num_lines, edit_rate=0.2, seed=0):
+    """Build two pasted texts where some lines have a few words changed."""
+    rng = random.Random(seed)
+    vocabulary = ['the', 'party', 'shall', 'agreement', 'notice', 'of', 'and', 'to',
+                  'in', 'any', 'such', 'provided', 'that', 'company', 'terms', 'date']
+    lines1 = []
+    lines2 = []
+    for _ in range(num_lines):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 20))]
+        lines1.append(' '.join(words))
+        if rng.random() < edit_rate:
+            words = list(words)
+            words[rng.randrange(len(words))] = 'amended'
+            del words[rng.randrange(len(words))]
+        lines2.append(' '.join(words))
+    return '\n'.join(lines1), '\n'.join(lines2)
+
+
+def best_of(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    print(f'{"lines":>8} {"old (s)":>10} {"new (s)":>10} {"speedup":>9}')
+    for num_lines in LINE_COUNTS:
+        text1, text2 = make_texts(num_lines)
+        old_time, expected = best_of(old_render, text1, text2)
+        new_time, result = best_of(highlight_text_diff, text1, text2)
+        if not same_result(expected, result):
+            raise AssertionError(f'Highlighted words differ at {num_lines} lines')
+        speedup = old_time / new_time
+        print(f'{num_lines:>8} {old_time:>10.3f} {new_time:>10.3f} {speedup:>8.1f}x')
+        if num_lines >= MIN_SPEEDUP_LINES and speedup < MIN_SPEEDUP:
+            raise AssertionError(f'Only {speedup:.1f}x faster at {num_lines} lines (need {MIN_SPEEDUP}x)')
+
+    # One inserted line shifts every later line when pairing line i with line i
+    print()
+    print(f'{"lines":>8} {"by index (s)":>13} {"aligned (s)":>12} {"spans":>16}')
+    for num_lines in LINE_COUNTS:
+        text1, _ = make_texts(num_lines, edit_rate=0)
+        text2 = 'an inserted first line\n' + text1
+        index_time, (index1, index2, _) = best_of(highlight_text_diff, text1, text2)
+        aligned_time, (aligned1, aligned2, _) = best_of(highlight_aligned_text_diff, text1, text2)
+        spans = f'{index1.count("<span") + index2.count("<span")} -> {aligned1.count("<span") + aligned2.count("<span")}'
+        print(f'{num_lines:>8} {index_time:>13.3f} {aligned_time:>12.3f} {spans:>16}')
+
+    # Nothing to align: the line diff must give up early, not run O(N^2)
+    print()
+    print(f'{"unrelated":>9} {"by index (s)":>13} {"aligned (s)":>12}')
+    for num_lines in LINE_COUNTS:
+        text1, _ = make_texts(num_lines, seed=1)
+        text2, _ = make_texts(num_lines, seed=2)
+        index_time, _ = best_of(highlight_text_diff, text1, text2)
+        aligned_time, _ = best_of(highlight_aligned_text_diff, text1, text2)
+        print(f'{num_lines:>9} {index_time:>13.3f} {aligned_time:>12.3f}')
+        if aligned_time > index_time * MAX_ALIGN_SLOWDOWN:
+            raise AssertionError(f'Aligning {num_lines} unrelated lines took {aligned_time:.2f} s, '
+                                 f'{aligned_time / index_time:.1f}x pairing by index')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Microbenchmark for the word matching step of compare_pdfs.
+
+Compares the old linear scan over the other page's word list, the hash
+index + bisect lookup and the vectorised find_changed_words on synthetic
+pages of increasing size.
+
+    python benchmarks/bench_word_matching.py
+"""
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_compare import PageWords, find_changed_words
+from sequence_diff import intern_tokens
+
+PAGE_SIZES = [500, 5000, 50000]
+# The linear scan is quadratic, so time a sample of lookups on big pages
+SCAN_SAMPLE = 500
+
+
+def linear_find_matching_word(target_word, target_line, page_words, tolerance=5):
+    """The original per-word scan, kept here as the reference."""
+    for word, line_num in zip(page_words.words, page_words.lines.tolist()):
+        if abs(line_num - target_line) <= tolerance:
+            if word == target_word:
+                return True
+    return False
+
+
+def build_word_index(page_words):
+    """Map each word to the sorted line numbers it appears on."""
+    index = {}
+    for word, line_num in zip(page_words.words, page_words.lines.tolist()):
+        index.setdefault(word, []).append(line_num)
+    for line_nums in index.values():
+        line_nums.sort()
+    return index
+
+
+def find_matching_word(target_word, target_line, word_index, tolerance=5):
+    """The per-word hash index + bisect lookup, kept here as the scalar reference."""
+    line_nums = word_index.get(target_word)
+    if not line_nums:
+        return False
+    # First occurrence at or after the lower bound decides the match
+    pos = bisect_left(line_nums, target_line - tolerance)
+    return pos < len(line_nums) and line_nums[pos] <= target_line + tolerance
+
+
+def make_page(num_words, vocabulary, words_per_line=12, seed=0):
+    """Build a synthetic page shaped like extract_page_words output."""
+    rng = random.Random(seed)
+    words = [rng.choice(vocabulary) for _ in range(num_words)]
+    lines = np.arange(num_words, dtype=np.intc) // words_per_line
+    return PageWords(words, np.zeros((num_words, 4)), lines, np.zeros(num_words, dtype=bool))
+
+
+def edit_page(page_words, edit_rate=0.05, seed=1):
+    """Replace a fraction of words so both sides have some differences."""
+    rng = random.Random(seed)
+    words = [word + '_changed' if rng.random() < edit_rate else word for word in page_words.words]
+    return PageWords(words, page_words.bboxes, page_words.lines, page_words.italic)
+
+
+def main():
+    rng = random.Random(42)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+                  for _ in range(2000)]
+
+    print(f'{"words":>8} {"scan (s)":>12} {"index (s)":>12} {"array (s)":>12} {"speedup":>10}')
+    for num_words in PAGE_SIZES:
+        words1 = make_page(num_words, vocabulary)
+        words2 = edit_page(words1)
+
+        # Reference: linear scan, extrapolated from a sample on large pages
+        sample_size = SCAN_SAMPLE if num_words > SCAN_SAMPLE * 2 else num_words
+        lines1 = words1.lines.tolist()
+        start = time.perf_counter()
+        expected = [linear_find_matching_word(w, line, words2)
+                    for w, line in zip(words1.words[:sample_size], lines1[:sample_size])]
+        scan_time = (time.perf_counter() - start) * num_words / sample_size
+
+        start = time.perf_counter()
+        index2 = build_word_index(words2)
+        found = [find_matching_word(w, line, index2) for w, line in zip(words1.words, lines1)]
+        index_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ids1, ids2 = intern_tokens(words1.words, words2.words)
+        changed = find_changed_words(ids1, words1.lines, ids2, words2.lines)
+        array_time = time.perf_counter() - start
+
+        if found[:len(expected)] != expected:
+            raise AssertionError(f'Index lookup disagrees with linear scan at {num_words} words')
+        if (~changed).tolist() != found:
+            raise AssertionError(f'find_changed_words disagrees with index lookup at {num_words} words')
+
+        label = ' (est)' if sample_size < num_words else ''
+        print(f'{num_words:>8} {scan_time:>12.4f} {index_time:>12.4f} {array_time:>12.4f} '
+              f'{scan_time / array_time:>9.0f}x{label}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+class CompareStats:
+    """Per-stage timings and counters for a PDF comparison.
+
+    Pass an instance as stats= to compare_pdfs / iter_compare_pdfs. Stage
+    times are wall-clock seconds summed over all pages (and over all worker
+    processes when workers > 1). If on_stage is given it is called as
+    on_stage(stage, seconds) whenever a timed stage finishes in this process.
+    """
+
+    def __init__(self, on_stage=None):
+        self.timings = {}
+        self.counters = {}
+        self.on_stage = on_stage
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+            if self.on_stage is not None:
+                self.on_stage(stage, elapsed)
+
+    def add(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def merge(self, data):
+        """Add timings and counters from another instance's as_dict()."""
+        for stage, seconds in data['timings'].items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        for counter, amount in data['counters'].items():
+            self.add(counter, amount)
+
+    def as_dict(self):
+        return {'timings': dict(self.timings), 'counters': dict(self.counters)}
+
+    def report(self):
+        """Return a plain-text table of stage timings and counters."""
+        lines = ['Stage timings:']
+        for stage, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            lines.append(f'  {stage:<16} {seconds * 1000:>10.1f} ms')
+        lines.append('Counters:')
+        for counter, amount in sorted(self.counters.items()):
+            lines.append(f'  {counter:<16} {amount:>10}')
+        return '\n'.join(lines)
+
+def stage_timer(stats, stage):
+    """Time a stage on stats, or do nothing when stats is None."""
+    return stats.time(stage) if stats is not None else nullcontext()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+import fitz
+import numpy as np
+
+from pdf_compare import PageWords, extract_page_words, fingerprint_words
+from result_cache import file_sha256
+
+# Bump when extract_page_words changes so stale indexes are rebuilt
+INDEX_VERSION = 2
+MAGIC = b'PDFWIDX1'
+
+# Column name -> array typecode. Words of a page are stored as one UTF-8
+# string joined with newlines (words never contain whitespace).
+COLUMNS = (
+    ('page_words', 'I'),   # word offset of each page, page_count + 1 entries
+    ('page_text', 'Q'),    # byte offset of each page's text, page_count + 1 entries
+    ('text', 'B'),         # UTF-8 word text
+    ('bboxes', 'd'),       # x0, y0, x1, y1 per word
+    ('lines', 'i'),        # line (block) number per word
+    ('italic', 'B'),       # 1 if the word is italic
+)
+
+def build_index(pdf_path, index_path):
+    """Extract every page of a PDF and write the columnar index file."""
+    page_words = array('I', [0])
+    page_text = array('Q', [0])
+    text = bytearray()
+    bboxes = array('d')
+    lines = array('i')
+    italic = array('B')
+
+    doc = fitz.open(pdf_path)
+    try:
+        italic_fonts = {}
+        for page in doc:
+            words = extract_page_words(page, italic_fonts)
+            text += '\n'.join(words.words).encode('utf-8')
+            bboxes.frombytes(words.bboxes.astype(np.float64).tobytes())
+            lines.frombytes(words.lines.astype(np.intc).tobytes())
+            italic.frombytes(words.italic.astype(np.uint8).tobytes())
+            page_words.append(len(lines))
+            page_text.append(len(text))
+        page_count = len(doc)
+    finally:
+        doc.close()
+
+    columns = {
+        'page_words': page_words,
+        'page_text': page_text,
+        'text': array('B', bytes(text)),
+        'bboxes': bboxes,
+        'lines': lines,
+        'italic': italic,
+    }
+    _write_index(index_path, page_count, columns)
+
+def _write_index(index_path, page_count, columns):
+    """Write columns 8-byte aligned after a JSON header, atomically."""
+    sections = {}
+    offset = 0
+    for name, typecode in COLUMNS:
+        length = len(columns[name]) * columns[name].itemsize
+        sections[name] = [offset, length, typecode]
+        offset += length + (-length % 8)
+    header = json.dumps({
+        'version': INDEX_VERSION,
+        'byteorder': sys.byteorder,
+        'page_count': page_count,
+        'sections': sections,
+    }).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    # A unique temp file, so processes indexing the same content don't collide
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for name, _ in COLUMNS:
+                data = columns[name].tobytes()
+                f.write(data)
+                f.write(b'\0' * (-len(data) % 8))
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ExtractionIndex:
+    """Read-only, memory-mapped view of a document's extracted words.
+
+    Columns are exposed as memoryviews over the mapped file, so loading an
+    index does no parsing or copying; page_words() copies the columns of a
+    single page into the PageWords that extract_page_words would return.
+    """
+
+    def __init__(self, index_path):
+        self.path = index_path
+        self._file = open(index_path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f'Empty extraction index: {index_path}')
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self):
+        data = memoryview(self._mmap)
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'Not an extraction index: {self.path}')
+        header_len = struct.unpack_from('<I', data, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(data[start:start + header_len]))
+        if header['version'] != INDEX_VERSION or header['byteorder'] != sys.byteorder:
+            raise ValueError(f'Extraction index needs rebuilding: {self.path}')
+        self.page_count = header['page_count']
+
+        base = start + header_len
+        self._views = [data]
+        self.columns = {}
+        for name, (offset, length, typecode) in header['sections'].items():
+            view = data[base + offset:base + offset + length].cast(typecode)
+            self._views.append(view)
+            self.columns[name] = view
+
+    def __len__(self):
+        return self.page_count
+
+    def page_words(self, page_num):
+        """Return the page's words as PageWords."""
+        columns = self.columns
+        start = columns['page_words'][page_num]
+        end = columns['page_words'][page_num + 1]
+        if start == end:
+            return PageWords.empty()
+        text = bytes(columns['text'][columns['page_text'][page_num]:columns['page_text'][page_num + 1]])
+        # np.array copies, so no view of the map outlives close()
+        return PageWords(
+            text.decode('utf-8').split('\n'),
+            np.array(columns['bboxes'][4 * start:4 * end]).reshape(-1, 4),
+            np.array(columns['lines'][start:end]),
+            np.array(columns['italic'][start:end]).astype(bool),
+        )
+
+    def page_fingerprint(self, page_num):
+        """Return the page's page_fingerprint() straight from the mapped columns."""
+        columns = self.columns
+        start = columns['page_words'][page_num]
+        end = columns['page_words'][page_num + 1]
+        text = columns['text'][columns['page_text'][page_num]:columns['page_text'][page_num + 1]]
+        return fingerprint_words(end - start, text, columns['lines'][start:end])
+
+    def close(self):
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        if getattr(self, '_mmap', None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class IndexStore:
+    """Directory of extraction indexes named by the SHA-256 of each PDF."""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+
+    def index_path(self, digest):
+        return os.path.join(self.index_dir, digest + '.idx')
+
+    def ensure(self, pdf_path, digest=None):
+        """Build the index for a PDF if needed and return its path."""
+        path = self.index_path(digest or file_sha256(pdf_path))
+        if os.path.exists(path):
+            try:
+                ExtractionIndex(path).close()
+                return path
+            except ValueError:
+                pass
+        build_index(pdf_path, path)
+        return path
+
+    def load(self, index_path):
+        """Map an index file returned by ensure()."""
+        return ExtractionIndex(index_path)
+
+    def open(self, pdf_path, digest=None):
+        """Return an ExtractionIndex for a PDF, building it on first use."""
+        return self.load(self.ensure(pdf_path, digest))
+
+    def index_folder(self, folder):
+        """Index every PDF in a folder. Returns (indexed, failed) paths."""
+        indexed = []
+        failed = []
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith('.pdf'):
+                continue
+            pdf_path = os.path.join(folder, name)
+            try:
+                self.ensure(pdf_path)
+                indexed.append(pdf_path)
+            except Exception as e:
+                print(f'Error indexing {pdf_path}: {e}')
+                failed.append(pdf_path)
+        return indexed, failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-extract the words of every PDF in a folder')
+    parser.add_argument('folder', help='Folder containing PDF files')
+    parser.add_argument('--index-dir', default='.extract_index',
+                        help='Where to store the indexes (default: .extract_index)')
+    args = parser.parse_args()
+
+    indexed, failed = IndexStore(args.index_dir).index_folder(args.folder)
+    print(f'Indexed {len(indexed)} PDF files into {args.index_dir}')
+    if failed:
+        print(f'{len(failed)} files could not be indexed')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_compare import compare_cache_key, iter_compare_pdfs
+
+# Job ids are uuid4 hex strings; anything else never touches the filesystem
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+class JobStore:
+    """Keeps each job's inputs, state and result in its own directory.
+
+    cleanup() deletes finished (done or failed) jobs older than max_age
+    seconds, then the oldest finished ones until the folder is under
+    max_bytes; queued and running jobs are never touched. start_janitor()
+    runs it on a background thread.
+    """
+
+    def __init__(self, root, max_age=None, max_bytes=None):
+        self.root = root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.removed = 0
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._stop = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+    def job_dir(self, job_id):
+        if not JOB_ID_RE.match(job_id or ''):
+            raise KeyError(job_id)
+        return os.path.join(self.root, job_id)
+
+    def input_path(self, job_id, index):
+        return os.path.join(self.job_dir(job_id), f'input{index}.pdf')
+
+    def result_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), 'result.pdf')
+
+    def create(self, options):
+        """Create a new job directory and return its record."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        job = {
+            'id': job_id,
+            'status': QUEUED,
+            'created': time.time(),
+            'started': None,
+            'finished': None,
+            'pages_done': 0,
+            'pages_total': None,
+            'error': None,
+            'options': options,
+        }
+        self.save(job)
+        return job
+
+    def save(self, job):
+        path = os.path.join(self.job_dir(job['id']), 'job.json')
+        tmp_path = path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+
+    def load(self, job_id):
+        """Return the stored job record, or None if there is no such job."""
+        try:
+            path = os.path.join(self.job_dir(job_id), 'job.json')
+        except KeyError:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def all_jobs(self):
+        jobs = []
+        for name in os.listdir(self.root):
+            job = self.load(name)
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+    def delete(self, job_id):
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def _job_size(self, job_id):
+        size = 0
+        with os.scandir(self.job_dir(job_id)) as it:
+            for entry in it:
+                if entry.is_file():
+                    size += entry.stat().st_size
+        return size
+
+    def cleanup(self, now=None):
+        """Enforce max_age and max_bytes on finished jobs. Returns the number removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        finished = []
+        total = 0
+        for job in self.all_jobs():
+            try:
+                size = self._job_size(job['id'])
+            except OSError:
+                continue
+            total += size
+            if job['status'] in (DONE, FAILED):
+                finished.append((job['finished'] or job['created'], size, job['id']))
+
+        for finished_at, size, job_id in sorted(finished):
+            too_old = self.max_age is not None and now - finished_at > self.max_age
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                break
+            self.delete(job_id)
+            total -= size
+            removed += 1
+
+        # Directories of jobs that were never fully created
+        if self.max_age is not None:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if (JOB_ID_RE.match(entry.name) and entry.is_dir() and
+                            not os.path.exists(os.path.join(entry.path, 'job.json')) and
+                            now - entry.stat().st_mtime > self.max_age):
+                        shutil.rmtree(entry.path, ignore_errors=True)
+        self.removed += removed
+        return removed
+
+    def start_janitor(self, interval=600):
+        """Run cleanup() every interval seconds on a daemon thread."""
+        if self._janitor is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while True:
+                try:
+                    self.cleanup()
+                except Exception as e:
+                    print(f'Job cleanup failed: {e}')
+                if self._stop.wait(interval):
+                    break
+
+        self._janitor = threading.Thread(target=run, name='job-janitor', daemon=True)
+        self._janitor.start()
+
+    def stop_janitor(self):
+        self._stop.set()
+        if self._janitor is not None:
+            self._janitor.join()
+            self._janitor = None
+
+class JobQueue:
+    """Runs PDF comparisons on a bounded pool of background threads.
+
+    At most max_workers comparisons run at once and at most max_queued more
+    wait for a slot; further submissions raise QueueFullError so the web tier
+    can push back instead of piling up work. Each comparison can itself use a
+    process pool for its pages (compare_workers).
+    """
+
+    def __init__(self, store, max_workers=2, max_queued=20, compare_workers=1, cache=None):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.compare_workers = compare_workers
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='compare-job')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    def start(self):
+        """Requeue jobs that were waiting or running when the process stopped.
+
+        Call this once, in the process that serves requests. If two processes
+        recovered the same store, every interrupted job would run twice.
+        """
+        for job in sorted(self.store.all_jobs(), key=lambda job: job['created']):
+            if job['status'] in (QUEUED, RUNNING):
+                job['status'] = QUEUED
+                job['pages_done'] = 0
+                self.store.save(job)
+                with self._lock:
+                    self._queued += 1
+                self._executor.submit(self._run, job['id'])
+
+    def submit(self, pdf1_file, pdf2_file, specific_italic_words=None, mode='page'):
+        """Store both uploads and queue their comparison.
+
+        pdf1_file/pdf2_file are objects with a save(path) method, such as
+        werkzeug FileStorage. Returns the new job record.
+        """
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise QueueFullError(f'Too many queued comparisons ({self._queued})')
+            self._queued += 1
+        try:
+            job = self.store.create({
+                'specific_italic_words': specific_italic_words,
+                'mode': mode,
+            })
+            pdf1_file.save(self.store.input_path(job['id'], 1))
+            pdf2_file.save(self.store.input_path(job['id'], 2))
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+        self._executor.submit(self._run, job['id'])
+        return job
+
+    def _run(self, job_id):
+        job = self.store.load(job_id)
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            job['status'] = RUNNING
+            job['started'] = time.time()
+            self.store.save(job)
+            self._compare(job)
+            job['status'] = DONE
+            with self._lock:
+                self._completed += 1
+        except Exception as e:
+            print(f'Comparison job {job_id} failed: {e}')
+            print(traceback.format_exc())
+            job['status'] = FAILED
+            job['error'] = str(e)
+            with self._lock:
+                self._failed += 1
+        finally:
+            job['finished'] = time.time()
+            self.store.save(job)
+            with self._lock:
+                self._running -= 1
+
+    def _compare(self, job):
+        job_id = job['id']
+        options = job['options']
+        pdf1_path = self.store.input_path(job_id, 1)
+        pdf2_path = self.store.input_path(job_id, 2)
+        result_path = self.store.result_path(job_id)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = compare_cache_key(self.cache, pdf1_path, pdf2_path,
+                                          options.get('specific_italic_words'), options.get('mode', 'page'))
+            cached_path = self.cache.get(cache_key)
+            if cached_path is not None:
+                shutil.copyfile(cached_path, result_path)
+                return
+
+        results = iter_compare_pdfs(
+            pdf1_path, pdf2_path, result_path,
+            specific_italic_words=options.get('specific_italic_words'),
+            workers=self.compare_workers,
+            mode=options.get('mode', 'page'),
+        )
+        for result in results:
+            job['pages_done'] = result['page_num'] + 1
+            job['pages_total'] = result['page_count']
+            self.store.save(job)
+
+        if cache_key is not None:
+            self.cache.put_file(cache_key, result_path)
+
+    def status(self, job_id):
+        """Return the job record, or None if there is no such job."""
+        return self.store.load(job_id)
+
+    def metrics(self):
+        """Return queue depth and job counters."""
+        with self._lock:
+            return {
+                'queued': self._queued,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'expired': self.store.removed,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
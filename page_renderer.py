@@ -0,0 +1,176 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import fitz
+
+from result_cache import ResultCache, file_sha256
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+# Zoom levels pages can be rendered at (1 = 72 dpi). A fixed set bounds the
+# number of images per page, so viewers share them instead of each asking
+# for a slightly different size.
+ZOOM_LEVELS = (0.5, 1, 1.5, 2, 3)
+
+# Image formats and their MIME types; WebP needs Pillow
+IMAGE_FORMATS = {'png': 'image/png'}
+if Image is not None and features.check('webp'):
+    IMAGE_FORMATS['webp'] = 'image/webp'
+WEBP_QUALITY = 80
+# Encoder effort 0-6: 2 is about twice as fast as Pillow's default (4) for
+# nearly the same size on text pages
+WEBP_METHOD = 2
+
+# Bump when rendering changes so old images are not served
+RENDER_VERSION = 1
+
+class PageRenderer:
+    """Renders PDF pages to PNG/WebP images on demand, with an LRU cache.
+
+    Images are keyed by the SHA-256 of the document, the page, the zoom and
+    the format, so a page is rendered once however many viewers (or jobs
+    with an identical result) look at it. The most recently served images
+    are kept in memory up to memory_bytes; every rendered image is also
+    kept on disk in a ResultCache, which evicts the least recently used
+    ones past max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, memory_bytes=64 * 1024 * 1024,
+                 max_open_docs=4):
+        self.disk = ResultCache(cache_dir, max_bytes=max_bytes)
+        self.memory_bytes = memory_bytes
+        self.max_open_docs = max_open_docs
+        self.renders = 0
+        self.memory_hits = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._hashes = {}
+        self._page_sizes = {}
+        self._docs = OrderedDict()
+        self._lock = threading.Lock()
+        # PyMuPDF documents must not be used from two threads at once
+        self._render_lock = threading.Lock()
+
+    def document_hash(self, path):
+        """SHA-256 of a file, hashed once per path, size and mtime."""
+        stat = os.stat(path)
+        memo_key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(memo_key)
+        if digest is None:
+            digest = file_sha256(path)
+            with self._lock:
+                if len(self._hashes) > 1024:
+                    self._hashes.clear()
+                self._hashes[memo_key] = digest
+        return digest
+
+    def _open(self, doc_hash, path):
+        """Return an open document, keeping the last max_open_docs open."""
+        doc = self._docs.pop(doc_hash, None)
+        if doc is None:
+            doc = fitz.open(path)
+        self._docs[doc_hash] = doc
+        while len(self._docs) > self.max_open_docs:
+            _, old_doc = self._docs.popitem(last=False)
+            old_doc.close()
+        return doc
+
+    def page_sizes(self, path, doc_hash=None):
+        """Return [(width, height)] in points for every page of a document."""
+        doc_hash = doc_hash or self.document_hash(path)
+        sizes = self._page_sizes.get(doc_hash)
+        if sizes is None:
+            with self._render_lock:
+                doc = self._open(doc_hash, path)
+                sizes = [(page.rect.width, page.rect.height) for page in doc]
+            self._page_sizes[doc_hash] = sizes
+        return sizes
+
+    def render(self, path, page_num, zoom=1, fmt='png', doc_hash=None):
+        """Return (image bytes, cache key) for a page, rendering it on a miss.
+
+        page_num is 0-based. Raises ValueError for a zoom not in ZOOM_LEVELS
+        or a format not in IMAGE_FORMATS, and IndexError for a page outside
+        the document. doc_hash can be passed when the caller already knows
+        the file's SHA-256 (e.g. an upload id).
+        """
+        if zoom not in ZOOM_LEVELS:
+            raise ValueError(f"Unsupported zoom {zoom} (use one of {', '.join(f'{z:g}' for z in ZOOM_LEVELS)})")
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format {fmt} (use one of {', '.join(IMAGE_FORMATS)})")
+        doc_hash = doc_hash or self.document_hash(path)
+        key = f'{doc_hash}-p{page_num}-z{zoom:g}-v{RENDER_VERSION}'
+        suffix = '.' + fmt
+
+        with self._lock:
+            data = self._memory.get(key + suffix)
+            if data is not None:
+                self._memory.move_to_end(key + suffix)
+                self.memory_hits += 1
+                return data, key
+
+        data = self._read(self.disk.get(key, suffix))
+        if data is None:
+            with self._render_lock:
+                # Another request may have rendered it while this one waited
+                data = self._read(self.disk._entry_path(key, suffix))
+                if data is None:
+                    data = self._render(doc_hash, path, page_num, zoom, fmt)
+                    self.disk.put_bytes(key, data, suffix)
+        self._remember(key + suffix, data)
+        return data, key
+
+    def _read(self, cached_path):
+        if cached_path is None:
+            return None
+        try:
+            with open(cached_path, 'rb') as f:
+                return f.read()
+        except OSError:
+            # Missing, or evicted since the lookup
+            return None
+
+    def _render(self, doc_hash, path, page_num, zoom, fmt):
+        doc = self._open(doc_hash, path)
+        if not 0 <= page_num < doc.page_count:
+            raise IndexError(f'Page {page_num + 1} is out of range (document has {doc.page_count} pages)')
+        # Annotations (the comparison highlights) are rendered too
+        pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        self.renders += 1
+        if fmt == 'png':
+            return pix.tobytes('png')
+        image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=WEBP_METHOD)
+        return buffer.getvalue()
+
+    def _remember(self, key, data):
+        """Keep an image in the in-memory LRU, evicting the oldest past memory_bytes."""
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, old_data = self._memory.popitem(last=False)
+                self._memory_size -= len(old_data)
+
+    def stats(self):
+        """Return render and cache counters for memory and disk."""
+        with self._lock:
+            memory = {
+                'entries': len(self._memory),
+                'size_bytes': self._memory_size,
+                'max_bytes': self.memory_bytes,
+                'hits': self.memory_hits,
+            }
+        return {'renders': self.renders, 'memory': memory, 'disk': self.disk.stats()}
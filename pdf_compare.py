@@ -1,205 +1,703 @@
 import fitz
 import argparse
+import hashlib
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+import numpy as np
+
+from compare_stats import CompareStats, stage_timer
+from result_cache import ResultCache
+from sequence_diff import anchored_matching_blocks, intern_tokens
+
 def is_italic_font(page, span):
     """Check if the text uses an italic font."""
     # Get the font name from the span
     font_name = span.get("font", "")
-    text = span.get("text", "").strip()
-    
-    # Get all fonts in the page
-    fonts = page.get_fonts()
     
     # Check if it's an italic font
     return "LightIt" in font_name or "Italic" in font_name
 
-def compare_pdfs(pdf1_path, pdf2_path, output_path=None, specific_italic_words=None):
-    """Compare text content of two PDF files and highlight differences in a new PDF."""
-    try:
-        # Open the PDFs with PyMuPDF
+class PageWords:
+    """The words of one page as parallel columns.
+    
+    words is a list of strings, bboxes an (n, 4) float array of x0, y0, x1,
+    y1, lines an int array with the line (block) number of each word and
+    italic a bool array.
+    """
+    __slots__ = ('words', 'bboxes', 'lines', 'italic')
+    
+    def __init__(self, words, bboxes, lines, italic):
+        self.words = words
+        self.bboxes = bboxes
+        self.lines = lines
+        self.italic = italic
+    
+    @classmethod
+    def empty(cls):
+        return cls([], np.empty((0, 4)), np.empty(0, dtype=np.intc), np.empty(0, dtype=bool))
+    
+    def __len__(self):
+        return len(self.words)
+
+def extract_page_words(page, italic_fonts=None, stats=None):
+    """Extract a page's words, bboxes, line numbers and italic flags as PageWords."""
+    # Font name -> italic flag, shared across the pages of one document
+    if italic_fonts is None:
+        italic_fonts = {}
+    with stage_timer(stats, 'get_text'):
+        page_dict = page.get_text("dict")
+    
+    words = []
+    starts = []
+    # One (x0, y0, y1, char width, block number, italic, word count) row per span
+    spans = []
+    with stage_timer(stats, 'split_words'):
+        for block in page_dict["blocks"]:
+            block_num = block.get("number", 0)
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    text = span.get("text", "")
+                    span_words = text.split()
+                    if not span_words:
+                        continue
+                    font_name = span.get("font", "")
+                    is_italic = italic_fonts.get(font_name)
+                    if is_italic is None:
+                        is_italic = italic_fonts[font_name] = is_italic_font(page, span)
+                    
+                    # Character offset of each word, searching on from the previous
+                    # word so repeated words keep their own positions
+                    pos = 0
+                    for word in span_words:
+                        pos = text.find(word, pos)
+                        starts.append(pos)
+                        pos += len(word)
+                    words.extend(span_words)
+                    x0, y0, x1, y1 = span["bbox"]
+                    spans.append((x0, y0, y1, (x1 - x0) / len(text), block_num, is_italic, len(span_words)))
+        
+        if not words:
+            page_words = PageWords.empty()
+        else:
+            # Characters are assumed to be equally wide within a span
+            span_rows = np.array(spans, dtype=np.float64)
+            counts = span_rows[:, 6].astype(np.intp)
+            x0, y0, y1, char_width = (np.repeat(span_rows[:, i], counts) for i in range(4))
+            lengths = np.fromiter(map(len, words), dtype=np.float64, count=len(words))
+            bboxes = np.empty((len(words), 4))
+            bboxes[:, 0] = x0 + np.array(starts, dtype=np.float64) * char_width
+            bboxes[:, 1] = y0
+            bboxes[:, 2] = bboxes[:, 0] + lengths * char_width
+            bboxes[:, 3] = y1
+            page_words = PageWords(
+                words, bboxes,
+                np.repeat(span_rows[:, 4].astype(np.intc), counts),
+                np.repeat(span_rows[:, 5].astype(bool), counts),
+            )
+    if stats is not None:
+        stats.add('words_extracted', len(page_words))
+    return page_words
+
+def fingerprint_words(word_count, text, lines):
+    """Hash a page's newline-joined UTF-8 word text and its line numbers.
+    
+    lines is a C int array or a buffer with the same layout, which lets
+    extraction indexes fingerprint a page without decoding it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(word_count.to_bytes(8, 'little'))
+    digest.update(lines)
+    digest.update(text)
+    return digest.digest()
+
+def page_fingerprint(page_words):
+    """Fingerprint a page's word sequence (words and line numbers).
+    
+    Pages with equal fingerprints pair every word with an identical word on
+    the same line, so they never get diff highlights.
+    """
+    text = '\n'.join(page_words.words).encode('utf-8')
+    return fingerprint_words(len(page_words), text, np.ascontiguousarray(page_words.lines, dtype=np.intc))
+
+def find_changed_words(ids, lines, other_ids, other_lines, tolerance=5):
+    """Flag words with no equal word within tolerance lines on the other side.
+    
+    ids/other_ids are interned word ids (see sequence_diff.intern_tokens)
+    and lines/other_lines the words' line numbers. (id, line) pairs are
+    packed into one sorted int64 key so every lookup is a single
+    searchsorted.
+    Returns a bool array, True for changed words.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    other_ids = np.asarray(other_ids, dtype=np.int64)
+    if not len(other_ids):
+        return np.ones(len(ids), dtype=bool)
+    lines = np.asarray(lines, dtype=np.int64)
+    other_lines = np.asarray(other_lines, dtype=np.int64)
+    # Keep the line window of one word from reaching another word's keys
+    low = min(lines.min(initial=0), other_lines.min())
+    stride = max(lines.max(initial=0), other_lines.max()) - low + tolerance + 1
+    other_keys = np.sort(other_ids * stride + (other_lines - low))
+    keys = ids * stride + (lines - low)
+    pos = np.searchsorted(other_keys, keys - tolerance)
+    found = pos < len(other_keys)
+    found[found] = other_keys[pos[found]] <= keys[found] + tolerance
+    return ~found
+
+# Highlight colours and opacities used in the comparison output
+RED = (1, 0, 0)
+GREEN = (0, 1, 0)
+BLUE = (0, 0, 1)
+DIFF_OPACITY = 0.3
+ITALIC_OPACITY = 0.2
+
+def _add_side_results(result, page_words, changed, color, x_offset, changed_key, italic_key,
+                      italic_filter):
+    """Fill in one document's half of a page result (see build_page_result)."""
+    words = page_words.words
+    italic_positions = np.flatnonzero(page_words.italic)
+    result[italic_key] = [words[i] for i in italic_positions.tolist()]
+    
+    changed = np.asarray(changed, dtype=bool)
+    marked = changed
+    blue = None
+    if italic_filter and len(italic_positions):
+        # Only highlight specific italic words if they are provided
+        blue = np.zeros(len(words), dtype=bool)
+        blue[italic_positions] = [words[i].lower() in italic_filter for i in italic_positions.tolist()]
+        marked = marked | blue
+    
+    # Only the highlighted words are visited one by one
+    positions = np.flatnonzero(marked)
+    rects = page_words.bboxes[positions]
+    if x_offset:
+        rects = rects + (x_offset, 0, x_offset, 0)
+    highlights = result['highlights']
+    changed_words = result[changed_key]
+    for i, rect in zip(positions.tolist(), rects.tolist()):
+        rect = tuple(rect)
+        if changed[i]:
+            highlights.append((rect, color, DIFF_OPACITY))
+            changed_words.append(words[i])
+        if blue is not None and blue[i]:
+            highlights.append((rect, BLUE, ITALIC_OPACITY))
+
+def build_page_result(words1, words2, changed1, changed2, page_width, specific_italic_words=None):
+    """Turn per-word change flags for one output page into a page result.
+    
+    words1/words2 are PageWords and changed1/changed2 bool arrays with one
+    flag per word. Returns a dict with the (rect, color, opacity) highlights
+    in the order they should be added to the output page, the words only
+    found on each side and the italic words found on each side.
+    """
+    result = {
+        'highlights': [],
+        'removed_words': [],
+        'added_words': [],
+        'italic_words1': [],
+        'italic_words2': [],
+    }
+    italic_filter = {w.lower() for w in specific_italic_words} if specific_italic_words else None
+    
+    # Differences and italic text in first document
+    _add_side_results(result, words1, changed1, RED, 0, 'removed_words', 'italic_words1', italic_filter)
+    # Differences and italic text in second document (right half of the page)
+    _add_side_results(result, words2, changed2, GREEN, page_width, 'added_words', 'italic_words2',
+                      italic_filter)
+    return result
+
+def diff_page_words(words1, words2, page_width, specific_italic_words=None, stats=None):
+    """Work out the highlights for one page pair (see build_page_result)."""
+    if not (words1 and words2):
+        return build_page_result(PageWords.empty(), PageWords.empty(), [], [], page_width)
+    
+    with stage_timer(stats, 'fingerprint'):
+        identical = page_fingerprint(words1) == page_fingerprint(words2)
+    if identical:
+        # Unchanged page: only italic highlights can apply
+        if stats is not None:
+            stats.add('identical_pages')
+        return build_page_result(words1, words2, np.zeros(len(words1), dtype=bool),
+                                 np.zeros(len(words2), dtype=bool), page_width, specific_italic_words)
+    
+    with stage_timer(stats, 'match'):
+        # A word changed if it is not found in a similar position on the other side
+        ids1, ids2 = intern_tokens(words1.words, words2.words)
+        changed1 = find_changed_words(ids1, words1.lines, ids2, words2.lines)
+        changed2 = find_changed_words(ids2, words2.lines, ids1, words1.lines)
+        result = build_page_result(words1, words2, changed1, changed2, page_width, specific_italic_words)
+    if stats is not None:
+        stats.add('lookups', len(words1) + len(words2))
+        stats.add('highlights', len(result['highlights']))
+    return result
+
+def _stream_lines(pages):
+    """Line numbers of a document's word stream, counting on across pages."""
+    lines = []
+    offset = 0
+    for words in pages:
+        lines.append(words.lines.astype(np.int64) + offset)
+        if len(words):
+            offset += int(words.lines.max()) + 1
+    return np.concatenate(lines) if lines else np.zeros(0, dtype=np.int64)
+
+def diff_document_words(pages1, pages2, page_width, specific_italic_words=None, stats=None):
+    """Align the word streams of two whole documents and map changes back to pages.
+    
+    pages1/pages2 are per-page word lists. Unlike diff_page_words, text that
+    reflows onto another page is still matched, so an inserted paragraph only
+    highlights the inserted words. Stretches too different to align within
+    the diff's work bound (see anchored_matching_blocks) are matched like
+    page mode instead, so unrelated documents cannot tie up a worker for
+    hours. Returns one page result per output page.
+    """
+    with stage_timer(stats, 'match'):
+        tokens1, tokens2 = intern_tokens(
+            [word for words in pages1 for word in words.words],
+            [word for words in pages2 for word in words.words]
+        )
+        changed1 = np.ones(len(tokens1), dtype=bool)
+        changed2 = np.ones(len(tokens2), dtype=bool)
+        blocks, unresolved = anchored_matching_blocks(tokens1, tokens2)
+        for i, j, size in blocks:
+            changed1[i:i + size] = False
+            changed2[j:j + size] = False
+        
+        if unresolved:
+            # A word is unchanged if the other side has it within a few lines
+            # of the same place, counting lines from the start of the stretch
+            ids1 = np.asarray(tokens1, dtype=np.int64)
+            ids2 = np.asarray(tokens2, dtype=np.int64)
+            lines1 = _stream_lines(pages1)
+            lines2 = _stream_lines(pages2)
+            for alo, ahi, blo, bhi in unresolved:
+                stretch_lines1 = lines1[alo:ahi] - lines1[alo]
+                stretch_lines2 = lines2[blo:bhi] - lines2[blo]
+                changed1[alo:ahi] = find_changed_words(ids1[alo:ahi], stretch_lines1,
+                                                       ids2[blo:bhi], stretch_lines2)
+                changed2[blo:bhi] = find_changed_words(ids2[blo:bhi], stretch_lines2,
+                                                       ids1[alo:ahi], stretch_lines1)
+            if stats is not None:
+                stats.add('unaligned_words', sum(ahi - alo + bhi - blo for alo, ahi, blo, bhi in unresolved))
+        
+        results = []
+        start1 = start2 = 0
+        for page_num in range(max(len(pages1), len(pages2))):
+            words1 = pages1[page_num] if page_num < len(pages1) else PageWords.empty()
+            words2 = pages2[page_num] if page_num < len(pages2) else PageWords.empty()
+            results.append(build_page_result(
+                words1, words2,
+                changed1[start1:start1 + len(words1)],
+                changed2[start2:start2 + len(words2)],
+                page_width, specific_italic_words
+            ))
+            start1 += len(words1)
+            start2 += len(words2)
+    if stats is not None:
+        stats.add('aligned_words', len(tokens1) + len(tokens2))
+        stats.add('highlights', sum(len(result['highlights']) for result in results))
+    return results
+
+def load_page_words(doc, page_num, italic_fonts=None, stats=None, index=None):
+    """Return one page's PageWords, from an extraction index if given."""
+    if page_num >= len(doc):
+        return PageWords.empty()
+    if index is None:
+        return extract_page_words(doc[page_num], italic_fonts, stats)
+    with stage_timer(stats, 'load_index'):
+        words = index.page_words(page_num)
+    if stats is not None:
+        stats.add('words_loaded', len(words))
+    return words
+
+def extract_page_pair(doc1, doc2, page_num, italic_fonts1=None, italic_fonts2=None, stats=None,
+                      index1=None, index2=None):
+    """Extract the words of one page of each open document."""
+    words1 = load_page_words(doc1, page_num, italic_fonts1, stats, index1)
+    words2 = load_page_words(doc2, page_num, italic_fonts2, stats, index2)
+    return words1, words2
+
+def compare_page_pair(doc1, doc2, page_num, page_width, specific_italic_words=None,
+                      italic_fonts1=None, italic_fonts2=None, stats=None, index1=None, index2=None,
+                      summary_only=False):
+    """Extract and diff one page pair of two open documents.
+    
+    With summary_only and both extraction indexes, a page whose indexed
+    fingerprints match is returned as an empty result without decoding its
+    words (its italic words are not reported).
+    """
+    if (summary_only and index1 is not None and index2 is not None
+            and page_num < len(index1) and page_num < len(index2)):
+        with stage_timer(stats, 'fingerprint'):
+            identical = index1.page_fingerprint(page_num) == index2.page_fingerprint(page_num)
+        if identical:
+            if stats is not None:
+                stats.add('identical_pages')
+            return build_page_result(PageWords.empty(), PageWords.empty(), [], [], page_width)
+    words1, words2 = extract_page_pair(doc1, doc2, page_num, italic_fonts1, italic_fonts2, stats,
+                                       index1, index2)
+    if page_num >= len(doc1) or page_num >= len(doc2):
+        # A page only one document has: all of its words were removed or added
+        if stats is not None:
+            stats.add('extra_pages')
+        return build_page_result(words1, words2, np.ones(len(words1), dtype=bool),
+                                 np.ones(len(words2), dtype=bool), page_width, specific_italic_words)
+    return diff_page_words(words1, words2, page_width, specific_italic_words, stats)
+
+def page_differs(result):
+    """Whether a page result from iter_compare_pdfs counts as a change.
+    
+    A page that only one document has differs even without any words
+    (e.g. an added blank or scanned page).
+    """
+    return bool(result['removed_words'] or result['added_words'] or result['extra_page'])
+
+def merge_highlights(highlights):
+    """Merge word highlights into one rect per run of adjacent words.
+    
+    Consecutive highlights of the same colour on the same line are joined
+    when the gap between them is no wider than a word space. Returns a list
+    of (color, opacity, rects) groups, one per colour per line, in the order
+    the lines were first highlighted.
+    """
+    groups = {}
+    for rect, color, opacity in highlights:
+        x0, y0, x1, y1 = rect
+        # Words from one line share their span's top and bottom
+        key = (color, opacity, round(y0, 1), round(y1, 1))
+        rects = groups.get(key)
+        if rects is None:
+            groups[key] = [[x0, y0, x1, y1]]
+            continue
+        last = rects[-1]
+        if 0 <= x0 - last[2] <= (y1 - y0) * 0.5:
+            last[2] = max(last[2], x1)
+        else:
+            rects.append([x0, y0, x1, y1])
+    return [(color, opacity, rects) for (color, opacity, _, _), rects in groups.items()]
+
+def add_page_highlights(page, highlights, style='merged'):
+    """Add the highlights produced by build_page_result to a page.
+    
+    style='merged' writes one multi-quad highlight annotation per colour per
+    line, 'word' writes one annotation per word, and 'draw' paints
+    translucent rectangles into the page content instead of annotating.
+    Returns the number of annotations written.
+    """
+    if style == 'word':
+        for rect, color, opacity in highlights:
+            highlight = page.add_highlight_annot(fitz.Rect(rect))
+            highlight.set_colors(stroke=color)
+            highlight.set_opacity(opacity)
+            highlight.update()
+        return len(highlights)
+    
+    groups = merge_highlights(highlights)
+    if style == 'draw':
+        if not groups:
+            return 0
+        shape = page.new_shape()
+        for color, opacity, rects in groups:
+            for rect in rects:
+                shape.draw_rect(fitz.Rect(rect))
+            shape.finish(color=None, fill=color, fill_opacity=opacity, width=0)
+        shape.commit()
+        return 0
+    
+    for color, opacity, rects in groups:
+        highlight = page.add_highlight_annot(quads=[fitz.Rect(rect) for rect in rects])
+        highlight.set_colors(stroke=color)
+        highlight.set_opacity(opacity)
+        highlight.update()
+    return len(groups)
+
+# Per-process state for the parallel page workers
+_worker_state = {}
+
+def _init_page_worker(pdf1_path, pdf2_path, page_width, specific_italic_words, collect_stats=False,
+                      index_paths=None, summary_only=False):
+    """Open each worker's own document handles once."""
+    _worker_state['doc1'] = fitz.open(pdf1_path)
+    _worker_state['doc2'] = fitz.open(pdf2_path)
+    _worker_state['index1'] = _worker_state['index2'] = None
+    if index_paths is not None:
+        from extraction_index import ExtractionIndex
+        _worker_state['index1'] = ExtractionIndex(index_paths[0])
+        _worker_state['index2'] = ExtractionIndex(index_paths[1])
+    _worker_state['page_width'] = page_width
+    _worker_state['specific_italic_words'] = specific_italic_words
+    _worker_state['italic_fonts1'] = {}
+    _worker_state['italic_fonts2'] = {}
+    _worker_state['collect_stats'] = collect_stats
+    _worker_state['summary_only'] = summary_only
+
+def _compare_page_in_worker(page_num):
+    """Diff one page pair using the worker's own document handles.
+    
+    Returns (page result, stats dict or None) so the parent can merge the
+    worker's stage timings.
+    """
+    state = _worker_state
+    stats = CompareStats() if state['collect_stats'] else None
+    result = compare_page_pair(
+        state['doc1'], state['doc2'], page_num, state['page_width'],
+        state['specific_italic_words'], state['italic_fonts1'], state['italic_fonts2'], stats,
+        state['index1'], state['index2'], state['summary_only']
+    )
+    return result, stats.as_dict() if stats is not None else None
+
+def _extract_page_in_worker(page_num):
+    """Extract one page pair using the worker's own document handles."""
+    state = _worker_state
+    stats = CompareStats() if state['collect_stats'] else None
+    words = extract_page_pair(state['doc1'], state['doc2'], page_num,
+                              state['italic_fonts1'], state['italic_fonts2'], stats,
+                              state['index1'], state['index2'])
+    return words, stats.as_dict() if stats is not None else None
+
+def _merge_worker_stats(worker_results, stats):
+    """Yield worker payloads, folding their stats into stats."""
+    for payload, worker_stats in worker_results:
+        if stats is not None and worker_stats is not None:
+            stats.merge(worker_stats)
+        yield payload
+
+# Ways of pairing up the text of the two documents (see iter_compare_pdfs)
+COMPARE_MODES = ('page', 'document')
+
+# Ways of writing highlights into the output (see add_page_highlights)
+HIGHLIGHT_STYLES = ('merged', 'word', 'draw')
+
+def _flush_output(output_doc, output_path, saved):
+    """Write pages added so far to disk and reopen the output lazily.
+    
+    The first flush writes the file, later ones append incremental updates.
+    Reopening drops the in-memory copies of pages that are already on disk,
+    but also PyMuPDF's record of the source objects already copied, so each
+    chunk embeds the inputs' shared fonts and images again (the file grows
+    by about their size per chunk).
+    """
+    if saved:
+        output_doc.saveIncr()
+    else:
+        output_doc.save(output_path)
+    output_doc.close()
+    return fitz.open(output_path)
+
+def iter_compare_pdfs(pdf1_path, pdf2_path, output_path=None, specific_italic_words=None,
+                      workers=1, flush_every=None, mode='page', highlight_style='merged',
+                      stats=None, index_store=None, summary_only=False, index_paths=None):
+    """Compare two PDFs page by page, yielding each page's result as it finishes.
+    
+    Each yielded dict is a build_page_result result plus 'page_num',
+    'page_count' and 'extra_page' (True for a page only one document has;
+    in page mode all of its words are reported as removed or added). If output_path is given the side-by-side comparison PDF is
+    written there; with flush_every=N the pages are written to disk every N
+    pages so memory use stays flat for very long documents. The file is
+    complete once the generator is exhausted.
+    
+    mode='page' compares page i with page i. mode='document' extracts both
+    documents first and aligns their whole word streams (diff_document_words),
+    so text that moved to another page is not reported as changed.
+    highlight_style is passed to add_page_highlights. A CompareStats passed
+    as stats collects per-stage timings and counters. With an
+    extraction_index.IndexStore as index_store, page words are read from the
+    documents' persistent indexes (built on first use) instead of PyMuPDF.
+    Callers that already built both indexes can pass their paths as
+    index_paths instead, which skips hashing the inputs again.
+    
+    summary_only=True only reports which pages differ: no output PDF is
+    written, and in page mode with an index_store, pages whose fingerprints
+    match are not decoded at all (see compare_page_pair).
+    """
+    if mode not in COMPARE_MODES:
+        raise ValueError(f'Unknown compare mode: {mode}')
+    if highlight_style not in HIGHLIGHT_STYLES:
+        raise ValueError(f'Unknown highlight style: {highlight_style}')
+    with stage_timer(stats, 'open'):
         doc1 = fitz.open(pdf1_path)
         doc2 = fitz.open(pdf2_path)
+    output_doc = fitz.open() if output_path and not summary_only else None
+    saved = False
+    pool = None
+    index1 = index2 = None
+    try:
+        max_pages = max(len(doc1), len(doc2))
+        use_pool = workers and workers > 1 and max_pages > 1
         
-        print('Creating output document...')
-        # Create a new PDF for the comparison result
-        if output_path is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_path = f'comparison_result_{timestamp}.pdf'
-        output_doc = fitz.open()
-        print(f'Output will be saved as: {output_path}')
+        if index_paths is None and index_store is not None:
+            with stage_timer(stats, 'load_index'):
+                index_paths = (index_store.ensure(pdf1_path), index_store.ensure(pdf2_path))
+        # Pool workers map the index files themselves
+        if index_paths is not None and not use_pool:
+            from extraction_index import ExtractionIndex
+            with stage_timer(stats, 'load_index'):
+                index1 = ExtractionIndex(index_paths[0])
+                index2 = ExtractionIndex(index_paths[1])
         
-        # Process each page
-        max_pages = max(len(doc1), len(doc2))
-        print(f'Processing {max_pages} pages...')
-        
-        for page_num in range(max_pages):
-            # Create a new page
-            page_width = max(doc1[0].rect.width if len(doc1) > 0 else 0,
-                           doc2[0].rect.width if len(doc2) > 0 else 0)
-            page_height = max(doc1[0].rect.height if len(doc1) > 0 else 0,
-                            doc2[0].rect.height if len(doc2) > 0 else 0)
-            new_page = output_doc.new_page(width=page_width * 2, height=page_height)
-            
-            # Process first document
-            if page_num < len(doc1):
-                text1 = doc1[page_num].get_text()
-                # Copy content to left side
-                new_page.show_pdf_page(
-                    fitz.Rect(0, 0, page_width, page_height),
-                    doc1,
-                    page_num
-                )
-            else:
-                text1 = ""
-            
-            # Process second document
-            if page_num < len(doc2):
-                text2 = doc2[page_num].get_text()
-                # Copy content to right side
-                new_page.show_pdf_page(
-                    fitz.Rect(page_width, 0, page_width * 2, page_height),
-                    doc2,
-                    page_num
-                )
+        # Output pages are sized from the first page of each document
+        page_width = max(doc1[0].rect.width if len(doc1) > 0 else 0,
+                       doc2[0].rect.width if len(doc2) > 0 else 0)
+        page_height = max(doc1[0].rect.height if len(doc1) > 0 else 0,
+                        doc2[0].rect.height if len(doc2) > 0 else 0)
+        
+        # Italic lookups are cached per document, not per span
+        italic_fonts1 = {}
+        italic_fonts2 = {}
+        
+        if use_pool:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_page_worker,
+                initargs=(pdf1_path, pdf2_path, page_width, specific_italic_words, stats is not None,
+                          index_paths, summary_only)
+            )
+            chunksize = max(1, max_pages // (workers * 4))
+            if mode == 'document':
+                page_words = _merge_worker_stats(
+                    pool.map(_extract_page_in_worker, range(max_pages), chunksize=chunksize), stats)
             else:
-                text2 = ""
-            
-            # Compare text and highlight differences
-            if text1 and text2:
-                # Function to check if a block contains a bullet point
-                def is_bullet_point(text):
-                    return any(bullet in text for bullet in ['•', '-', '·', '*', '○', '▪', '◦', '▫', '⁃'])
-                
-                # Process bullet points
-                blocks1 = doc1[page_num].get_text("blocks")
-                blocks2 = doc2[page_num].get_text("blocks")
-                
-                # Process regular text (word by word)
-                # Get words with their positions and font info
-                words1 = []
-                words2 = []
-                
-                # Get words from first document
-                dict1 = doc1[page_num].get_text("dict")
-                for block in dict1["blocks"]:
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            text = span.get("text", "").strip()
-                            if text:
-                                # Split text into individual words
-                                words = text.split()
-                                word_width = (span["bbox"][2] - span["bbox"][0]) / len(text)
-                                
-                                # Calculate position for each word
-                                for word in words:
-                                    word_start = span["bbox"][0] + text.index(word) * word_width
-                                    word_bbox = [
-                                        word_start,
-                                        span["bbox"][1],
-                                        word_start + len(word) * word_width,
-                                        span["bbox"][3]
-                                    ]
-                                    is_italic = is_italic_font(doc1[page_num], span)
-                                    words1.append((word, word_bbox, block.get("number", 0), is_italic))
-                
-                # Get words from second document
-                dict2 = doc2[page_num].get_text("dict")
-                for block in dict2["blocks"]:
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            text = span.get("text", "").strip()
-                            if text:
-                                # Split text into individual words
-                                words = text.split()
-                                word_width = (span["bbox"][2] - span["bbox"][0]) / len(text)
-                                
-                                # Calculate position for each word
-                                for word in words:
-                                    word_start = span["bbox"][0] + text.index(word) * word_width
-                                    word_bbox = [
-                                        word_start,
-                                        span["bbox"][1],
-                                        word_start + len(word) * word_width,
-                                        span["bbox"][3]
-                                    ]
-                                    is_italic = is_italic_font(doc2[page_num], span)
-                                    words2.append((word, word_bbox, block.get("number", 0), is_italic))
-                
-                # Function to find similar positions
-                def find_matching_word(target_word, target_line, words_list, tolerance=5):
-                    for word, coords, line_num, _ in words_list:
-                        # Check if words are on similar lines (within tolerance)
-                        if abs(line_num - target_line) <= tolerance:
-                            if word == target_word:
-                                return True
-                    return False
-                
-                # Find and highlight differences and italic text in first document
-                for word, coords, line_num, is_italic in words1:
-                    # Debug print for italic words
-                    if is_italic:
-                        print(f'Found italic word in doc1: {word}')
+                page_results = _merge_worker_stats(
+                    pool.map(_compare_page_in_worker, range(max_pages), chunksize=chunksize), stats)
+        elif mode == 'document':
+            page_words = (
+                extract_page_pair(doc1, doc2, page_num, italic_fonts1, italic_fonts2, stats,
+                                  index1, index2)
+                for page_num in range(max_pages)
+            )
+        else:
+            page_results = (
+                compare_page_pair(doc1, doc2, page_num, page_width, specific_italic_words,
+                                  italic_fonts1, italic_fonts2, stats, index1, index2, summary_only)
+                for page_num in range(max_pages)
+            )
+        
+        if mode == 'document':
+            # The whole word streams are needed before any page can be diffed
+            pages1 = []
+            pages2 = []
+            for words1, words2 in page_words:
+                pages1.append(words1)
+                pages2.append(words2)
+            page_results = diff_document_words(pages1, pages2, page_width, specific_italic_words, stats)
+            pages1 = pages2 = None
+        
+        # Results arrive in page order in both modes
+        for page_num, result in enumerate(page_results):
+            if output_doc is not None:
+                with stage_timer(stats, 'show_pdf_page'):
+                    # Create a new page
+                    new_page = output_doc.new_page(width=page_width * 2, height=page_height)
                     
-                    # Check for differences
-                    if not find_matching_word(word, line_num, words2):
-                        # Word not found in similar position in doc2
-                        highlight = new_page.add_highlight_annot(fitz.Rect(coords))
-                        highlight.set_colors(stroke=(1, 0, 0))  # Red
-                        highlight.set_opacity(0.3)  # Make it more transparent
-                        highlight.update()
+                    # Copy content to left side
+                    if page_num < len(doc1):
+                        new_page.show_pdf_page(fitz.Rect(0, 0, page_width, page_height), doc1, page_num)
                     
-                    # Check for italic text
-                    if is_italic and specific_italic_words:
-                        # Only highlight specific italic words if they are provided
-                        if word.lower() in [w.lower() for w in specific_italic_words]:
-                            highlight = new_page.add_highlight_annot(fitz.Rect(coords))
-                            highlight.set_colors(stroke=(0, 0, 1))  # Blue
-                            highlight.set_opacity(0.2)  # Make blue highlight very transparent
-                            highlight.update()
+                    # Copy content to right side
+                    if page_num < len(doc2):
+                        new_page.show_pdf_page(fitz.Rect(page_width, 0, page_width * 2, page_height), doc2, page_num)
                 
-                # Find and highlight differences and italic text in second document
-                for word, coords, line_num, is_italic in words2:
-                    # Debug print for italic words
-                    if is_italic:
-                        print(f'Found italic word in doc2: {word}')
-                    
-                    # Check for differences
-                    if not find_matching_word(word, line_num, words1):
-                        # Word not found in similar position in doc1
-                        rect = fitz.Rect(
-                            coords[0] + page_width,
-                            coords[1],
-                            coords[2] + page_width,
-                            coords[3]
-                        )
-                        highlight = new_page.add_highlight_annot(rect)
-                        highlight.set_colors(stroke=(0, 1, 0))  # Green
-                        highlight.set_opacity(0.3)  # Make it more transparent
-                        highlight.update()
-                    
-                    # Check for italic text
-                    if is_italic and specific_italic_words:
-                        # Only highlight specific italic words if they are provided
-                        if word.lower() in [w.lower() for w in specific_italic_words]:
-                            rect = fitz.Rect(
-                                coords[0] + page_width,
-                                coords[1],
-                                coords[2] + page_width,
-                                coords[3]
-                            )
-                            highlight = new_page.add_highlight_annot(rect)
-                            highlight.set_colors(stroke=(0, 0, 1))  # Blue
-                            highlight.set_opacity(0.2)  # Make blue highlight very transparent
-                            highlight.update()
-        
-        # Save and close
-        print('Saving comparison result...')
-        output_doc.save(output_path)
-        output_doc.close()
+                with stage_timer(stats, 'annotate'):
+                    annotations = add_page_highlights(new_page, result['highlights'], highlight_style)
+                if stats is not None:
+                    stats.add('annotations', annotations)
+                
+                if flush_every and (page_num + 1) % flush_every == 0 and page_num + 1 < max_pages:
+                    with stage_timer(stats, 'save'):
+                        output_doc = _flush_output(output_doc, output_path, saved)
+                    saved = True
+            
+            if stats is not None:
+                stats.add('pages')
+            result['page_num'] = page_num
+            result['page_count'] = max_pages
+            result['extra_page'] = page_num >= min(len(doc1), len(doc2))
+            yield result
+        
+        if output_doc is not None:
+            # Save and close
+            with stage_timer(stats, 'save'):
+                if saved:
+                    output_doc.saveIncr()
+                else:
+                    output_doc.save(output_path)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if output_doc is not None:
+            output_doc.close()
+        for index in (index1, index2):
+            if index is not None:
+                index.close()
         doc1.close()
         doc2.close()
+
+def compare_cache_key(cache, pdf1_path, pdf2_path, specific_italic_words=None, mode='page',
+                      highlight_style='merged'):
+    """ResultCache key of a comparison PDF.
+    
+    Every option that changes the output is part of the key, with the same
+    defaults as iter_compare_pdfs, so the CLI and the job queue share entries.
+    """
+    return cache.make_key(pdf1_path, pdf2_path, specific_italic_words=specific_italic_words,
+                          mode=mode, highlight_style=highlight_style)
+
+def compare_pdfs(pdf1_path, pdf2_path, output_path=None, specific_italic_words=None, workers=1,
+                 cache=None, flush_every=None, mode='page', highlight_style='merged', stats=None,
+                 index_store=None):
+    """Compare text content of two PDF files and highlight differences in a new PDF.
+    
+    With workers > 1 the page pairs are extracted and diffed in a process pool;
+    the output document is still assembled here in page order, so the result
+    matches a serial run. If a ResultCache is given, a repeated comparison of
+    the same inputs and options is copied from the cache instead of recomputed.
+    flush_every writes the output every N pages, mode picks page-by-page
+    or whole-document alignment and highlight_style picks how highlights
+    are written (see iter_compare_pdfs). Pass a CompareStats as stats to
+    collect per-stage timings and counters, and an IndexStore as index_store
+    to reuse persistent extraction indexes.
+    
+    Returns the output path, or None if the comparison failed.
+    """
+    try:
+        if output_path is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_path = f'comparison_result_{timestamp}.pdf'
+        
+        cache_key = None
+        if cache is not None:
+            cache_key = compare_cache_key(cache, pdf1_path, pdf2_path, specific_italic_words, mode,
+                                          highlight_style)
+            cached_path = cache.get(cache_key)
+            if cached_path is not None:
+                shutil.copyfile(cached_path, output_path)
+                print(f'Using cached comparison result: {output_path}')
+                return output_path
+        
+        print('Creating output document...')
+        print(f'Output will be saved as: {output_path}')
+        if workers and workers > 1:
+            print(f'Comparing pages with {workers} workers...')
+        
+        results = iter_compare_pdfs(pdf1_path, pdf2_path, output_path, specific_italic_words,
+                                    workers=workers, flush_every=flush_every, mode=mode,
+                                    highlight_style=highlight_style, stats=stats,
+                                    index_store=index_store)
+        for result in results:
+            if result['page_num'] == 0:
+                print(f"Processing {result['page_count']} pages...")
+            
+            # Debug print for italic words
+            for word in result['italic_words1']:
+                print(f'Found italic word in doc1: {word}')
+            for word in result['italic_words2']:
+                print(f'Found italic word in doc2: {word}')
+        
+        if cache_key is not None:
+            cache.put_file(cache_key, output_path)
         
         print('\nComparison completed successfully!')
         print(f'Result saved as: {output_path}')
@@ -207,6 +705,7 @@ def compare_pdfs(pdf1_path, pdf2_path, output_path=None, specific_italic_words=N
         print('- Red: Content only in first PDF')
         print('- Green: Content only in second PDF')
         print('- Yellow: Missing words between matching content')
+        return output_path
         
     except fitz.FileDataError as e:
         print(f'Error: Could not open PDF file - {str(e)}')
@@ -217,15 +716,79 @@ def compare_pdfs(pdf1_path, pdf2_path, output_path=None, specific_italic_words=N
         print('Detailed error:')
         print(traceback.format_exc())
 
-
+def summarize_differences(pdf1_path, pdf2_path, workers=1, mode='page', stats=None, index_store=None):
+    """Report which pages differ without writing a comparison PDF.
+    
+    Returns a dict with the page count, the 1-based numbers of the pages that
+    differ (see page_differs, so a page only one document has always counts)
+    and the total removed/added word counts.
+    """
+    summary = {'page_count': 0, 'changed_pages': [], 'removed_words': 0, 'added_words': 0}
+    results = iter_compare_pdfs(pdf1_path, pdf2_path, workers=workers, mode=mode, stats=stats,
+                                index_store=index_store, summary_only=True)
+    for result in results:
+        summary['page_count'] = result['page_count']
+        if page_differs(result):
+            summary['changed_pages'].append(result['page_num'] + 1)
+        summary['removed_words'] += len(result['removed_words'])
+        summary['added_words'] += len(result['added_words'])
+    return summary
 
 def main():
     parser = argparse.ArgumentParser(description='Compare text differences between two PDF files')
     parser.add_argument('pdf1', help='Path to first PDF file')
     parser.add_argument('pdf2', help='Path to second PDF file')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes used to compare pages (default: 1)')
+    parser.add_argument('--mode', choices=COMPARE_MODES, default='page',
+                        help='Compare page by page, or align the whole documents so text '
+                             'moved across page boundaries is not flagged (default: page)')
+    parser.add_argument('--highlight-style', choices=HIGHLIGHT_STYLES, default='merged',
+                        help='merged: one highlight per changed run of words per line, '
+                             'word: one highlight per word, draw: paint into the page '
+                             'instead of annotating (default: merged)')
+    parser.add_argument('--flush-every', type=int, metavar='N',
+                        help='Write the output PDF to disk every N pages to limit memory use '
+                             '(each chunk re-embeds the shared fonts and images, so the file grows)')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='Only report which pages differ, without writing a comparison PDF')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print per-stage timings and counters after the comparison')
+    parser.add_argument('--index-dir',
+                        help='Read page words from persistent extraction indexes in this directory '
+                             '(see extraction_index.py), building them on first use')
+    parser.add_argument('--cache-dir',
+                        help='Reuse results of earlier comparisons stored in this directory')
+    parser.add_argument('--cache-size-mb', type=int, default=512,
+                        help='Maximum size of the result cache in MB (default: 512)')
     
     args = parser.parse_args()
-    compare_pdfs(args.pdf1, args.pdf2)
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 * 1024)
+    index_store = None
+    if args.index_dir:
+        from extraction_index import IndexStore
+        index_store = IndexStore(args.index_dir)
+    stats = CompareStats() if args.profile else None
+    if args.summary_only:
+        summary = summarize_differences(args.pdf1, args.pdf2, workers=args.workers, mode=args.mode,
+                                        stats=stats, index_store=index_store)
+        changed = summary['changed_pages']
+        print(f"{len(changed)} of {summary['page_count']} pages differ "
+              f"({summary['removed_words']} words removed, {summary['added_words']} added)")
+        if changed:
+            print('Changed pages: ' + ', '.join(str(page) for page in changed))
+        if stats is not None:
+            print(stats.report())
+        sys.exit(1 if changed else 0)
+    compare_pdfs(args.pdf1, args.pdf2, workers=args.workers, cache=cache,
+                 flush_every=args.flush_every, mode=args.mode,
+                 highlight_style=args.highlight_style, stats=stats, index_store=index_store)
+    if stats is not None:
+        print(stats.report())
+    if cache is not None:
+        print(f'Cache stats: {cache.stats()}')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# Bump when the comparison output changes so old entries are not reused
+CACHE_VERSION = 2
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file in chunks so large PDFs are never fully loaded."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def normalize_options(options):
+    """Make compare options hashable in a stable way."""
+    normalized = {}
+    for name, value in options.items():
+        if value is None:
+            continue
+        if name == 'specific_italic_words':
+            # Matching is case-insensitive and order does not matter
+            value = sorted({w.lower() for w in value})
+        elif isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        elif isinstance(value, tuple):
+            value = list(value)
+        normalized[name] = value
+    return normalized
+
+class ResultCache:
+    """Disk-backed comparison result cache keyed by input content and options.
+
+    Entries are plain files named after their key. Recently used entries have
+    their mtime refreshed, and the oldest are evicted once the cache grows past
+    max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, pdf1_path, pdf2_path, **options):
+        """Build the cache key from both input files and the compare options."""
+        payload = {
+            'version': CACHE_VERSION,
+            'pdf1': file_sha256(pdf1_path),
+            'pdf2': file_sha256(pdf2_path),
+            'options': normalize_options(options),
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def get(self, key, suffix='.pdf'):
+        """Return the path of a cached entry, or None on a miss."""
+        path = self._entry_path(key, suffix)
+        with self._lock:
+            if os.path.exists(path):
+                try:
+                    # Mark as recently used for LRU eviction
+                    os.utime(path, None)
+                except OSError:
+                    pass
+                self.hits += 1
+                return path
+            self.misses += 1
+            return None
+
+    def put_file(self, key, src_path, suffix='.pdf'):
+        """Copy a finished result into the cache and return its cached path."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(src_path, tmp_path)
+        return self._commit(key, tmp_path, suffix)
+
+    def put_bytes(self, key, data, suffix='.json'):
+        """Store an in-memory result (e.g. a JSON diff summary)."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return self._commit(key, tmp_path, suffix)
+
+    def _commit(self, key, tmp_path, suffix):
+        path = self._entry_path(key, suffix)
+        with self._lock:
+            # Atomic rename so readers never see a half-written entry
+            os.replace(tmp_path, path)
+            self.stores += 1
+            self._evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """Remove least recently used entries until under max_bytes."""
+        if self.max_bytes is None:
+            return
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            entries = self._entries()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'size_bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,250 @@
+"""Linear-space sequence diff (Myers' O(ND) algorithm).
+
+Unlike difflib.SequenceMatcher, the cost grows with the number of edits
+rather than with the product of the sequence lengths, which keeps whole
+document word streams (100k+ words) cheap to align when most text is
+unchanged. Opcodes use the same format as SequenceMatcher.get_opcodes().
+
+The cost still grows with N*D, so very different inputs are slow.
+anchored_matching_blocks bounds it: long ranges are first split on runs of
+words that occur once on each side (patience diff), and a range that needs more
+than max_d edits is given up on and returned to the caller as unresolved.
+"""
+from bisect import bisect_left
+
+# Ranges at least this long are split on unique common runs of
+# ANCHOR_RUN items before Myers
+ANCHOR_MIN_SIZE = 1000
+ANCHOR_RUN = 3
+# Edits searched from each end of a range before it is left unresolved
+MAX_D = 500
+
+
+def intern_tokens(a, b):
+    """Map the items of a and b to small integers so comparisons are cheap."""
+    table = {}
+    a_ids = [table.setdefault(item, len(table)) for item in a]
+    b_ids = [table.setdefault(item, len(table)) for item in b]
+    return a_ids, b_ids
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi, max_d=None):
+    """Find the middle snake of the shortest edit path between two ranges.
+
+    Returns (x0, y0, x1, y1) in absolute indices: a[x0:x1] == b[y0:y1] lies on
+    an optimal path and splits the problem into two smaller ones. With max_d,
+    returns None instead once more than max_d edits from each end would be
+    needed, which caps the work at O((n + m) * max_d).
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    full_d = (n + m + 1) // 2
+    if max_d is None or max_d > full_d:
+        max_d = full_d
+        bounded = False
+    else:
+        bounded = True
+    offset = max_d + 1
+    vf = [0] * (2 * offset + 1)
+    vb = [0] * (2 * offset + 1)
+
+    for d in range(max_d + 1):
+        # Forward search from the top-left corner
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + vb[offset + delta - k] >= n:
+                return alo + x0, blo + y0, alo + x, blo + y
+
+        # Backward search from the bottom-right corner (on reversed indices)
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + vf[offset + delta - k] >= n:
+                return ahi - x, bhi - y, ahi - x0, bhi - y0
+
+    if bounded:
+        return None
+    raise AssertionError('no middle snake found')
+
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi, size):
+    """Return (i, j) where a[i:i+size] == b[j:j+size] occurs once in each range.
+
+    Runs of several items are used because single words repeat too often in
+    long documents to be unique. Only the longest chain of pairs in the same
+    order on both sides is kept (patience diff), so the anchors never cross.
+    """
+    counts = {}
+    for i in range(alo, ahi - size + 1):
+        key = tuple(a[i:i + size])
+        entry = counts.get(key)
+        if entry is None:
+            counts[key] = [i, None, 1, 0]
+        else:
+            entry[2] += 1
+    for j in range(blo, bhi - size + 1):
+        entry = counts.get(tuple(b[j:j + size]))
+        if entry is not None:
+            entry[1] = j
+            entry[3] += 1
+    pairs = sorted((i, j) for i, j, count_a, count_b in counts.values() if count_a == 1 and count_b == 1)
+    if not pairs:
+        return []
+
+    # Longest increasing subsequence of the b positions
+    tails = []
+    tail_index = []
+    previous = [None] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(index)
+        else:
+            tails[pos] = j
+            tail_index[pos] = index
+        previous[index] = tail_index[pos - 1] if pos else None
+    anchors = []
+    index = tail_index[-1]
+    while index is not None:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _matching_blocks(a, b, max_d=None, anchor_min_size=None):
+    """Shared core of matching_blocks and anchored_matching_blocks.
+
+    Returns (blocks, unresolved); unresolved lists the (alo, ahi, blo, bhi)
+    ranges given up on because they needed more than max_d edits.
+    """
+    blocks = []
+    unresolved = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # Common prefix and suffix are matched without any search
+        start = 0
+        while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+            start += 1
+        if start:
+            blocks.append((alo, blo, start))
+            alo += start
+            blo += start
+        end = 0
+        while alo < ahi - end and blo < bhi - end and a[ahi - 1 - end] == b[bhi - 1 - end]:
+            end += 1
+        if end:
+            blocks.append((ahi - end, bhi - end, end))
+            ahi -= end
+            bhi -= end
+        if alo == ahi or blo == bhi:
+            continue
+
+        if anchor_min_size is not None and (ahi - alo) + (bhi - blo) >= anchor_min_size:
+            anchors = _unique_anchors(a, alo, ahi, b, blo, bhi, ANCHOR_RUN)
+            if anchors:
+                # Matched anchors split the range; gaps are aligned separately
+                i, j = alo, blo
+                for ai, bj in anchors:
+                    if ai < i or bj < j:
+                        # Overlaps the previous anchor (consecutive runs)
+                        continue
+                    blocks.append((ai, bj, ANCHOR_RUN))
+                    stack.append((i, ai, j, bj))
+                    i, j = ai + ANCHOR_RUN, bj + ANCHOR_RUN
+                stack.append((i, ahi, j, bhi))
+                continue
+
+        snake = _middle_snake(a, alo, ahi, b, blo, bhi, max_d)
+        if snake is None:
+            unresolved.append((alo, ahi, blo, bhi))
+            continue
+        x0, y0, x1, y1 = snake
+        if x1 > x0:
+            blocks.append((x0, y0, x1 - x0))
+        stack.append((alo, x0, blo, y0))
+        stack.append((x1, ahi, y1, bhi))
+
+    blocks.sort()
+
+    # Merge touching runs so the result is as compact as difflib's
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            pi, pj, psize = merged[-1]
+            merged[-1] = (pi, pj, psize + size)
+        else:
+            merged.append((i, j, size))
+    merged.append((len(a), len(b), 0))
+    unresolved.sort()
+    return merged, unresolved
+
+
+def matching_blocks(a, b):
+    """Return (i, j, size) runs where a[i:i+size] == b[j:j+size], in order.
+
+    The result is a minimal diff. Like SequenceMatcher.get_matching_blocks()
+    the list ends with a (len(a), len(b), 0) sentinel.
+    """
+    return _matching_blocks(a, b)[0]
+
+
+def anchored_matching_blocks(a, b, max_d=MAX_D, anchor_min_size=ANCHOR_MIN_SIZE):
+    """matching_blocks with bounded work, for long and possibly unrelated inputs.
+
+    Ranges of at least anchor_min_size items are first split on runs of
+    ANCHOR_RUN items that occur once on each side, and Myers gives up on any range needing more
+    than max_d edits from each end. The result need not be minimal. Returns
+    (blocks, unresolved): unresolved lists the (alo, ahi, blo, bhi) ranges
+    left unaligned, which hold no blocks and are for the caller to match
+    some cheaper way.
+    """
+    return _matching_blocks(a, b, max_d, anchor_min_size)
+
+
+def get_opcodes(a, b):
+    """Return SequenceMatcher-style (tag, i1, i2, j1, j2) opcodes for a -> b."""
+    return blocks_to_opcodes(matching_blocks(a, b))
+
+
+def blocks_to_opcodes(blocks):
+    """Turn a matching_blocks-style list into get_opcodes-style opcodes.
+
+    Ranges left unresolved by anchored_matching_blocks hold no blocks, so
+    they come out as 'replace' (or 'delete'/'insert') opcodes.
+    """
+    opcodes = []
+    i = j = 0
+    for ai, bj, size in blocks:
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(('equal', ai, i, bj, j))
+    return opcodes
@@ -0,0 +1,222 @@
+import difflib
+from html import escape
+from itertools import islice
+
+from sequence_diff import anchored_matching_blocks, blocks_to_opcodes, get_opcodes, intern_tokens
+
+try:
+    import cydifflib
+except ImportError:
+    cydifflib = None
+
+# Words only found in the first / second text, styled by the page's CSS
+REMOVED_SPAN = '<span class="diff-removed">{}</span>'
+ADDED_SPAN = '<span class="diff-added">{}</span>'
+
+# Lines per hunk when a comparison is streamed (see iter_diff_hunks)
+HUNK_LINES = 500
+
+def _difflib_opcodes(a, b):
+    """Word diff with difflib.SequenceMatcher (the reference backend)."""
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+def _cydifflib_opcodes(a, b):
+    """Word diff with cydifflib, a C build of difflib giving identical results."""
+    return cydifflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+def _myers_opcodes(a, b):
+    """Minimal word diff with Myers' O(ND) algorithm over interned words.
+    
+    Linear in the line length when edits are few, where SequenceMatcher is
+    quadratic on long lines of repetitive words. Where a repeated word can be
+    matched in more than one place it may pick a different, equally short
+    alignment than difflib.
+    """
+    ids_a, ids_b = intern_tokens(a, b)
+    return get_opcodes(ids_a, ids_b)
+
+# Word diff backends: name -> function(a_words, b_words) returning opcodes
+# in SequenceMatcher.get_opcodes() format
+DIFF_BACKENDS = {'difflib': _difflib_opcodes, 'myers': _myers_opcodes}
+if cydifflib is not None:
+    DIFF_BACKENDS['cydifflib'] = _cydifflib_opcodes
+DEFAULT_DIFF_BACKEND = 'difflib'
+
+def get_diff_backend(name):
+    """Return the opcode function of a diff backend by name."""
+    try:
+        return DIFF_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable diff backend: {name} "
+                         f"(available: {', '.join(sorted(DIFF_BACKENDS))})")
+
+def _highlight_words(a_words, b_words, opcodes=_difflib_opcodes):
+    """Render two word lists with their differences highlighted.
+    
+    Each run of removed/added words becomes a single span. Returns
+    (highlighted_a, highlighted_b, differs).
+    """
+    if a_words == b_words:
+        # Unchanged lines (the common case) need no matcher at all
+        joined = escape(' '.join(a_words), quote=False)
+        return joined, joined, False
+    
+    result_a = []
+    result_b = []
+    for opcode, i1, i2, j1, j2 in opcodes(a_words, b_words):
+        if opcode == 'equal':
+            result_a.append(escape(' '.join(a_words[i1:i2]), quote=False))
+            result_b.append(escape(' '.join(b_words[j1:j2]), quote=False))
+            continue
+        # Deleted/replaced words are red in the first text
+        if opcode != 'insert':
+            result_a.append(REMOVED_SPAN.format(escape(' '.join(a_words[i1:i2]), quote=False)))
+        # Inserted/replaced words are green in the second text
+        if opcode != 'delete':
+            result_b.append(ADDED_SPAN.format(escape(' '.join(b_words[j1:j2]), quote=False)))
+    
+    # Join with a single space to ensure consistent spacing in the output
+    return ' '.join(result_a), ' '.join(result_b), True
+
+def highlight_line_diff(a, b, backend=DEFAULT_DIFF_BACKEND):
+    """Highlight the word differences between two lines.
+    
+    Runs one diff (see DIFF_BACKENDS) over the words of both lines and
+    renders both sides from the same opcodes. Returns (highlighted_a,
+    highlighted_b).
+    """
+    highlighted_a, highlighted_b, _ = _highlight_words(a.split(), b.split(), get_diff_backend(backend))
+    return highlighted_a, highlighted_b
+
+def _paired_rows(lines1, lines2, opcodes):
+    """Yield (html1, html2, changed) rows pairing line i with line i."""
+    for i in range(max(len(lines1), len(lines2))):
+        l1 = lines1[i] if i < len(lines1) else ''
+        l2 = lines2[i] if i < len(lines2) else ''
+        words1 = l1.split()
+        words2 = l2.split()
+        h1, h2, differs = _highlight_words(words1, words2, opcodes)
+        # Whitespace-only changes count as differences too
+        yield h1, h2, differs or ' '.join(words1) != l1 or ' '.join(words2) != l2
+
+def _aligned_rows(lines1, lines2, opcodes):
+    """Yield (html1, html2, changed) rows after aligning the lines.
+    
+    Lines are matched across the two texts first (Myers diff over interned,
+    whitespace-normalised lines). The line diff's work is bounded (see
+    anchored_matching_blocks), so unrelated texts stay cheap: stretches it
+    gives up on are paired line by line like any other changed lines.
+    html1 or html2 is None where a row has no line on that side.
+    """
+    normalized1 = [' '.join(line.split()) for line in lines1]
+    normalized2 = [' '.join(line.split()) for line in lines2]
+    ids1, ids2 = intern_tokens(normalized1, normalized2)
+    blocks, _ = anchored_matching_blocks(ids1, ids2)
+    
+    for opcode, i1, i2, j1, j2 in blocks_to_opcodes(blocks):
+        if opcode == 'equal':
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                # Whitespace-only changes count as differences, as in paired mode
+                changed = normalized1[i] != lines1[i] or normalized2[j] != lines2[j]
+                html = escape(normalized1[i], quote=False)
+                yield html, html, changed
+            continue
+        # Pair changed lines in order; leftovers are wholly removed/added
+        for k in range(max(i2 - i1, j2 - j1)):
+            l1 = lines1[i1 + k] if i1 + k < i2 else ''
+            l2 = lines2[j1 + k] if j1 + k < j2 else ''
+            h1, h2, _ = _highlight_words(l1.split(), l2.split(), opcodes)
+            yield h1 if i1 + k < i2 else None, h2 if j1 + k < j2 else None, True
+
+def iter_diff_rows(text1, text2, align=False, backend=DEFAULT_DIFF_BACKEND):
+    """Yield (html1, html2, changed) for each output row of a comparison.
+    
+    align=False pairs line i with line i (highlight_text_diff), align=True
+    matches the lines first (highlight_aligned_text_diff). backend names the
+    word diff used within lines (see DIFF_BACKENDS). Rows are produced
+    lazily, so large texts can be rendered and sent in pieces.
+    """
+    opcodes = get_diff_backend(backend)
+    lines1 = text1.splitlines()
+    lines2 = text2.splitlines()
+    if align:
+        return _aligned_rows(lines1, lines2, opcodes)
+    return _paired_rows(lines1, lines2, opcodes)
+
+def _join_rows(rows):
+    highlighted1 = []
+    highlighted2 = []
+    has_diff = False
+    for h1, h2, changed in rows:
+        if h1 is not None:
+            highlighted1.append(h1)
+        if h2 is not None:
+            highlighted2.append(h2)
+        has_diff = has_diff or changed
+    return '\n'.join(highlighted1), '\n'.join(highlighted2), has_diff
+
+def highlight_text_diff(text1, text2, backend=DEFAULT_DIFF_BACKEND):
+    """Highlight word differences line by line (line i against line i).
+    
+    Returns (highlighted1_html, highlighted2_html, has_diff).
+    """
+    return _join_rows(iter_diff_rows(text1, text2, backend=backend))
+
+def highlight_aligned_text_diff(text1, text2, backend=DEFAULT_DIFF_BACKEND):
+    """Highlight word differences after aligning the lines of both texts.
+    
+    Lines are matched across the two texts first (Myers diff over interned,
+    whitespace-normalised lines), so an inserted or deleted line does not
+    mark every following line as changed. Only the paired changed lines get
+    a word-level diff. Returns (highlighted1_html, highlighted2_html, has_diff).
+    """
+    return _join_rows(iter_diff_rows(text1, text2, align=True, backend=backend))
+
+def iter_diff_hunks(text1, text2, align=False, hunk_lines=HUNK_LINES, backend=DEFAULT_DIFF_BACKEND):
+    """Yield the comparison as hunks of up to hunk_lines rows.
+    
+    Each hunk is a dict with the HTML to append to each side ('html1',
+    'html2', including the newline that separates it from the previous hunk)
+    and the first line number of each side ('start1', 'start2'). A last
+    {'done': True, 'has_diff': ...} dict ends the stream.
+    """
+    lines_done = [0, 0]
+    has_diff = False
+    rows = iter_diff_rows(text1, text2, align, backend)
+    while True:
+        chunk = list(islice(rows, hunk_lines))
+        if not chunk:
+            break
+        hunk = {'start1': lines_done[0], 'start2': lines_done[1]}
+        for side in (0, 1):
+            lines = [row[side] for row in chunk if row[side] is not None]
+            html = '\n'.join(lines)
+            if lines and lines_done[side]:
+                html = '\n' + html
+            hunk[f'html{side + 1}'] = html
+            lines_done[side] += len(lines)
+        has_diff = has_diff or any(changed for _, _, changed in chunk)
+        yield hunk
+    yield {'done': True, 'has_diff': has_diff}
+
+def render_comparison_html(highlighted1_html, highlighted2_html):
+    """Wrap both highlighted texts in the side-by-side result markup."""
+    return f'''<div class="comparison-result">
+        <div class="row">
+            <div class="col-md-6">
+                <div class="card">
+                    <div class="card-header bg-primary text-white">First Text (with highlights)</div>
+                    <div class="card-body diff-text" id="diff-text1">{highlighted1_html}</div>
+                </div>
+            </div>
+            <div class="col-md-6">
+                <div class="card">
+                    <div class="card-header bg-success text-white">Second Text (with highlights)</div>
+                    <div class="card-body diff-text" id="diff-text2">{highlighted2_html}</div>
+                </div>
+            </div>
+        </div>
+        <div class="text-center mt-4">
+            <a href="/" class="btn btn-secondary">New Comparison</a>
+        </div>
+    </div>'''
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import fitz
+
+# Uploads are named by the SHA-256 of their content
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class InvalidUploadError(ValueError):
+    """Raised when an uploaded file is not a readable PDF."""
+
+class StoredUpload:
+    """An upload kept in an UploadStore.
+
+    Has the save(path) method of a werkzeug FileStorage, so it can be passed
+    anywhere an uploaded file is expected (e.g. JobQueue.submit).
+    """
+
+    def __init__(self, store, upload_id, filename):
+        self.store = store
+        self.id = upload_id
+        self.filename = filename
+
+    @property
+    def path(self):
+        return self.store.path(self.id)
+
+    def save(self, dst_path):
+        """Hard-link (or copy) the stored file to dst_path."""
+        with self.store._lock:
+            try:
+                os.link(self.path, dst_path)
+            except OSError:
+                shutil.copyfile(self.path, dst_path)
+
+class UploadStore:
+    """Content-addressed folder of uploaded PDFs with age and size limits.
+
+    Uploads are streamed to disk in chunks while being hashed, so the same
+    file uploaded twice is stored once. Page count and metadata are read once
+    per file and kept next to it as JSON. cleanup() deletes uploads older
+    than max_age seconds, then the least recently uploaded ones until the
+    folder is under max_bytes; start_janitor() runs it on a background thread.
+    """
+
+    def __init__(self, root, max_age=24 * 3600, max_bytes=2 * 1024 * 1024 * 1024,
+                 chunk_size=1024 * 1024):
+        self.root = root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.removed = 0
+        self._lock = threading.Lock()
+        self._info = {}
+        self._janitor = None
+        self._stop = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, upload_id):
+        if not UPLOAD_ID_RE.match(upload_id or ''):
+            raise KeyError(upload_id)
+        return os.path.join(self.root, upload_id + '.pdf')
+
+    def _info_path(self, upload_id):
+        return os.path.join(self.root, upload_id + '.json')
+
+    def save(self, file_storage):
+        """Store an uploaded file and return it as a StoredUpload.
+
+        Raises InvalidUploadError (and keeps nothing) if it is not a PDF.
+        """
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: file_storage.stream.read(self.chunk_size), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            upload_id = digest.hexdigest()
+            path = self.path(upload_id)
+            with self._lock:
+                if os.path.exists(path):
+                    # Already stored: keep the existing copy, mark it as recent
+                    os.remove(tmp_path)
+                    os.utime(path, None)
+                else:
+                    os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        try:
+            self.info(upload_id)
+        except InvalidUploadError:
+            self.delete(upload_id)
+            raise
+        return StoredUpload(self, upload_id, file_storage.filename)
+
+    def get(self, upload_id):
+        """Return the StoredUpload for an id, or None if it is not stored."""
+        try:
+            path = self.path(upload_id)
+        except KeyError:
+            return None
+        if not os.path.exists(path):
+            return None
+        return StoredUpload(self, upload_id, None)
+
+    def info(self, upload_id):
+        """Return the cached page count, page size and metadata of an upload."""
+        info = self._info.get(upload_id)
+        if info is not None:
+            return info
+        info_path = self._info_path(upload_id)
+        try:
+            with open(info_path) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            info = self._read_info(upload_id)
+            # A unique temp file, as concurrent requests may miss at once
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(info, f)
+                os.replace(tmp_path, info_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        self._info[upload_id] = info
+        return info
+
+    def _read_info(self, upload_id):
+        path = self.path(upload_id)
+        try:
+            doc = fitz.open(path)
+        except Exception:
+            raise InvalidUploadError('Not a readable PDF file')
+        try:
+            if not doc.is_pdf:
+                raise InvalidUploadError('Not a PDF file')
+            first_page = doc[0].rect if doc.page_count else None
+            return {
+                'id': upload_id,
+                'size_bytes': os.path.getsize(path),
+                'page_count': doc.page_count,
+                'page_width': first_page.width if first_page else None,
+                'page_height': first_page.height if first_page else None,
+                'metadata': {name: value for name, value in (doc.metadata or {}).items() if value},
+            }
+        finally:
+            doc.close()
+
+    def delete(self, upload_id):
+        with self._lock:
+            self._remove(upload_id)
+
+    def _remove(self, upload_id):
+        self._info.pop(upload_id, None)
+        for path in (self.path(upload_id), self._info_path(upload_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _uploads(self):
+        """Return (mtime, size, id) for every stored upload."""
+        uploads = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                upload_id, ext = os.path.splitext(entry.name)
+                if ext == '.pdf' and UPLOAD_ID_RE.match(upload_id) and entry.is_file():
+                    stat = entry.stat()
+                    uploads.append((stat.st_mtime, stat.st_size, upload_id))
+        return uploads
+
+    def cleanup(self, now=None):
+        """Enforce max_age and max_bytes. Returns the number of uploads removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            uploads = sorted(self._uploads())
+            total = sum(size for _, size, _ in uploads)
+            for mtime, size, upload_id in uploads:
+                too_old = self.max_age is not None and now - mtime > self.max_age
+                too_big = self.max_bytes is not None and total > self.max_bytes
+                if not (too_old or too_big):
+                    break
+                self._remove(upload_id)
+                total -= size
+                removed += 1
+
+            # Files from interrupted uploads, and anything else left behind
+            if self.max_age is not None:
+                with os.scandir(self.root) as it:
+                    for entry in it:
+                        name, ext = os.path.splitext(entry.name)
+                        if UPLOAD_ID_RE.match(name) and os.path.exists(os.path.join(self.root, name + '.pdf')):
+                            continue
+                        if entry.is_file() and now - entry.stat().st_mtime > self.max_age:
+                            try:
+                                os.remove(entry.path)
+                            except OSError:
+                                pass
+            self.removed += removed
+        return removed
+
+    def start_janitor(self, interval=600):
+        """Run cleanup() every interval seconds on a daemon thread."""
+        if self._janitor is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while True:
+                try:
+                    self.cleanup()
+                except Exception as e:
+                    print(f'Upload cleanup failed: {e}')
+                if self._stop.wait(interval):
+                    break
+
+        self._janitor = threading.Thread(target=run, name='upload-janitor', daemon=True)
+        self._janitor.start()
+
+    def stop_janitor(self):
+        self._stop.set()
+        if self._janitor is not None:
+            self._janitor.join()
+            self._janitor = None
+
+    def stats(self):
+        """Return the number and total size of stored uploads."""
+        with self._lock:
+            uploads = self._uploads()
+        return {
+            'uploads': len(uploads),
+            'size_bytes': sum(size for _, size, _ in uploads),
+            'max_bytes': self.max_bytes,
+            'max_age': self.max_age,
+            'removed': self.removed,
+        }